@@ -13,12 +13,14 @@ cTrader WebSocket Client – M5 Version with Wide Stops
 from __future__ import annotations  # volitelné, ale pomáhá do budoucna
 
 from typing import List, Dict, Deque, Optional, Callable, Any  # <<< DŮLEŽITÉ
-from collections import deque
+from collections import deque, OrderedDict
 import os
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 import asyncio
 import json
 import threading
+import traceback
+import time
 import logging
 import websockets
 
@@ -67,8 +69,135 @@ PT_DEAL_LIST_RES            = 2134  # PROTO_OA_DEAL_LIST_RES (for account balanc
 # PT_POSITIONS_REQ/RES REMOVED - caused collision with GET_ACCS_BY_TOKEN (2149/2150)
 PT_POSITION_STATUS_EVENT    = 2151
 
+# Payload type groups for routing/log filtering (frozenset: no per-frame list literal)
+_ACCOUNT_EVENT_PTS          = frozenset({PT_TRADER_RES, PT_POSITION_STATUS_EVENT})
+_NOISY_PTS                  = frozenset({2120})  # PT_SUBSCRIBE_DEPTH_QUOTES_REQ
+_FREQUENT_PTS               = frozenset({PT_SPOT_EVENT, PT_TRADER_RES})
+_QUIET_LOG_PTS              = _FREQUENT_PTS | _NOISY_PTS
+
+# ASCII log tags for the account/deal notify paths (no emoji in per-event log records)
+TAG_NOTIFY                  = "[NOTIFY]"
+TAG_DEAL_LIST               = "[DEAL_LIST]"
+TAG_DEAL_REQ                = "[DEAL_REQ]"
+
 # Timeframe constants
 PERIOD_M5                   = 3          
+M5_MS                       = 5 * 60 * 1000
+DAY_MS                      = 24 * 60 * 60 * 1000
+
+# Trendbar requests in flight at once during history bootstrap
+BOOTSTRAP_BATCH_SIZE        = 4
+
+# Max PT_DEAL_LIST_REQ pages followed (hasMore) for one snapshot or merged deals request
+DEAL_LIST_MAX_PAGES         = 10
+
+# Max awaited responses (track_response=True) tracked at once
+PENDING_RESPONSES_MAX       = 128
+
+# Consecutive exceptions after which an account/price/execution callback is unregistered
+CALLBACK_MAX_FAILURES       = 5
+
+# Max spot events buffered between _recv_loop and _spot_consumer
+SPOT_QUEUE_MAXSIZE          = 10_000
+
+# Forming M5 bar layout - flat list indexed by these slots (no dict hashing per tick)
+BAR_FIELDS = ("timestamp", "open", "high", "low", "close", "volume", "spread")
+_TS, _OPEN, _HIGH, _LOW, _CLOSE, _VOLUME, _SPREAD = range(len(BAR_FIELDS))
+
+
+def _bar_from_slots(slots: list) -> Dict:
+    """Materialize a forming-bar slot list into the bar dict consumers expect"""
+    return {
+        "timestamp": slots[_TS],
+        "open": slots[_OPEN],
+        "high": slots[_HIGH],
+        "low": slots[_LOW],
+        "close": slots[_CLOSE],
+        "volume": slots[_VOLUME],
+        "spread": slots[_SPREAD],
+    }
+
+
+def _epoch_ms() -> int:
+    """Current UTC time in epoch ms (no datetime allocation)"""
+    return time.time_ns() // 1_000_000
+
+
+def _m5_block_ms(ts_ms: int) -> int:
+    """Start of the M5 block containing ts_ms (epoch ms, integer floor)"""
+    return ts_ms - ts_ms % M5_MS
+
+
+def _m5_block_from_iso(timestamp: str) -> int:
+    """Start of the M5 block (epoch ms) for an ISO timestamp"""
+    # Python 3.11+ fromisoformat accepts the trailing 'Z' as well
+    return _m5_block_ms(int(datetime.fromisoformat(timestamp).timestamp()) * 1000)
+
+
+def _iso_from_ms(ms: int) -> str:
+    """Format epoch ms as UTC ISO timestamp (whole seconds - bars are minute aligned)"""
+    return time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(ms // 1000))
+
+
+def _hhmm_from_ms(ms: int) -> str:
+    """Format epoch ms as UTC HH:MM (for log lines)"""
+    return time.strftime("%H:%M", time.gmtime(ms // 1000))
+
+
+def _deal_balance_version(deal: Dict) -> int:
+    """balanceVersion of a deal's closePositionDetail (0 for deals that didn't close a position)"""
+    close_detail = deal.get("closePositionDetail")
+    return close_detail.get("balanceVersion", 0) if close_detail else 0
+
+
+def _decode_trendbars(arr: List[Dict], base_timestamp: int, spread: float) -> List[Dict]:
+    """Decode cTrader trendbars (prices relative to LOW, in 1/100000) into bar dicts"""
+    processed = []
+    append = processed.append
+    scale = 100000.0
+    for i, bar in enumerate(arr):
+        # Timestamp
+        minutes = bar.get("utcTimestampInMinutes")
+        ts_ms = minutes * 60000 if minutes is not None else base_timestamp + i * M5_MS
+
+        # SPRÁVNÉ DEKÓDOVÁNÍ - vše je relativní k LOW!
+        low_int = bar.get("low", 0)  # Absolutní hodnota
+        low_price = low_int / scale
+        open_price = (low_int + bar.get("deltaOpen", 0)) / scale
+        high_price = (low_int + bar.get("deltaHigh", 0)) / scale
+        close_price = (low_int + bar.get("deltaClose", 0)) / scale
+
+        # Sanity check - high musí být nejvyšší, low nejnižší
+        if open_price > close_price:
+            body_high, body_low = open_price, close_price
+        else:
+            body_high, body_low = close_price, open_price
+        if high_price < body_high:
+            high_price = body_high
+        if low_price > body_low:
+            low_price = body_low
+
+        bar_range = high_price - low_price
+
+        # Debug pro prvních pár barů
+        if i < 3:
+            logger.debug("Bar %d: O=%.2f, H=%.2f, L=%.2f, C=%.2f, Range=%.2f",
+                         i, open_price, high_price, low_price, close_price, bar_range)
+
+        # M5 může mít rozsah až 100-150 bodů při volatilitě
+        if bar_range > 200:
+            logger.warning("Bar %d: unusually high range %.1f", i, bar_range)
+
+        append({
+            "timestamp": _iso_from_ms(ts_ms),
+            "open": open_price,
+            "high": high_price,
+            "low": low_price,
+            "close": close_price,
+            "volume": bar.get("volume", 0),
+            "spread": spread
+        })
+    return processed
 
 
 class CTraderClient:
@@ -112,16 +241,30 @@ class CTraderClient:
 
         # CENTRALIZED MESSAGE PUMP - Request/Response pairing system
         self._pending_requests: Dict[str, Dict] = {}  # clientMsgId -> {payload_type, symbol_id, future}
-        self._response_futures: Dict[str, asyncio.Future] = {}  # msgId -> Future for responses
+        # msgId -> Future resolved by _recv_loop; bounded (oldest evicted), see PENDING_RESPONSES_MAX
+        self._pending_responses: OrderedDict[str, asyncio.Future] = OrderedDict()
+        self._recv_loop_active = False
+
+        # Sends from other threads before authorization, flushed by _flush_send_queue
+        self._authorized = False
+        self._account_ready = asyncio.Event()  # Set once account auth completes (per connection)
+        self._send_queue: List[tuple] = []  # (payload_type, payload)
 
         # THREAD-SAFE COMMAND QUEUE for cross-thread operations (order execution, etc.)
         self._command_queue = None  # Will be initialized when loop starts
         self._command_processor_task = None
 
         # Market data storage
-        self.bars: Dict[str, deque] = {}
+        self.bars: Dict[str, deque] = {}  # Closed M5 bars (dicts) per symbol
+        self._forming_bars: Dict[str, list] = {}  # Forming M5 bar per symbol, see BAR_FIELDS
+        self._pending_closed_bars: List[tuple] = []  # (symbol, bar, history) awaiting batched fanout
         self.current_price: Dict[str, Dict] = {}
-        self.last_bar_block: Dict[str, datetime] = {}  # For M5 aggregation
+        self.last_bar_block: Dict[str, int] = {}  # For M5 aggregation - block start in epoch ms
+        self._now_ms: int = 0  # Wall clock in epoch ms, refreshed once per received frame
+
+        # Spot events handed from _recv_loop to _spot_consumer
+        self._spot_queue: Optional[asyncio.Queue] = None
+        self._spot_dropped = 0
 
         # Callbacks
         self.on_tick_callback: Optional[Callable] = None
@@ -130,9 +273,17 @@ class CTraderClient:
         self.on_execution_callback: Optional[Callable] = None
 
         # Account monitoring callbacks (multiple subscribers)
-        self._account_callbacks = []
-        self._price_callbacks = []
-        self._execution_callbacks = []
+        # Registries keyed by the callable itself: O(1) dedup, insertion order kept.
+        # Not id(callback) - bound methods are new objects on every attribute access.
+        # Value = consecutive failures; CALLBACK_MAX_FAILURES in a row unregisters it.
+        self._account_callbacks: Dict[Callable, int] = {}
+        self._price_callbacks: Dict[Callable, int] = {}
+        self._execution_callbacks: Dict[Callable, int] = {}
+
+        # Callback presence flags for the tick hot path (see _refresh_callback_flags)
+        self._has_tick_cb = False
+        self._has_bar_cb = False
+        self._has_price_cb = False
 
         # Account state tracking
         # Initialize with configured balance (fallback if PT_TRADER_RES fails)
@@ -151,12 +302,60 @@ class CTraderClient:
         else:
             logger.error(f"[ACCOUNT] ❌ No account_balance in config! Will use 0 until execution events")
 
+        # Account snapshot cache - {'balance': float, 'ts': monotonic seconds}
+        # Dropped on ORDER_FILLED / balance-bearing PT_TRADER_RES, see _invalidate_snapshot
+        self._snapshot_cache: Optional[Dict] = None
+        self._snapshot_ttl = float(config.get('account_snapshot_ttl', 5.0))
+
+        # Newest known balance from closed deals - lets snapshots request only the delta
+        self._last_balance_version: int = 0
+        self._last_balance_ts: Optional[int] = None  # executionTimestamp (ms) of that deal
+        self._last_balance: int = 0  # balance (cents) after that deal
+
+        # Fixed-shape trader dict for account callbacks - .copy() and fill volatile fields
+        self._trader_data_template: Dict[str, Any] = {
+            "ctidTraderAccountId": None,
+            "balance": 0,
+            "equity": 0,
+            "margin": 0,
+            "freeMargin": 0,
+            "moneyDigits": 2,  # CRITICAL: Tell BalanceTracker to divide by 100
+            "depositCurrency": None,
+        }
+
         # Position storage for reference
         self.current_positions: List[Dict] = []
 
         self.use_historical_bootstrap = config.get('use_historical_bootstrap', True)
         self.history_cache_dir = config.get('history_cache_dir', './cache')
         self.history_bars_count = config.get('history_bars_count', 300)
+        # Cache lookup order: configured dir first, then legacy fallback locations
+        self._cache_search_dirs = tuple(dict.fromkeys(
+            [self.history_cache_dir, "./cache", "/config/cache", "cache"]
+        ))
+
+        # payloadType -> handler for _recv_loop (one dict lookup per frame)
+        self._recv_handlers: Dict[int, Callable[[Dict], None]] = {
+            PT_SPOT_EVENT: self._recv_spot_event,
+            PT_ERROR_RES: lambda msg: logger.error(f"cTrader ERROR: {msg}"),
+            PT_PONG_RES: lambda msg: None,
+            PT_NEW_ORDER_RES: self._recv_order_response,
+            PT_EXECUTION_EVENT: self._recv_execution_event,
+            PT_ORDER_ERROR_EVENT: self._recv_order_error,
+            PT_TRADER_RES: self._recv_account_event,
+            PT_POSITION_STATUS_EVENT: self._recv_account_event,
+            PT_DEAL_LIST_RES: self._recv_deal_list,
+        }
+        # Known noisy types are consumed silently to reduce log noise
+        for pt in _NOISY_PTS:
+            self._recv_handlers[pt] = lambda msg: None
+
+        # payloadType -> account state handler for _handle_account_event
+        self._account_event_dispatch: Dict[int, Callable[[Dict], bool]] = {
+            PT_TRADER_RES: self._on_trader_res,
+            PT_POSITION_STATUS_EVENT: self._on_position_status,
+            PT_EXECUTION_EVENT: self._on_execution_margin,
+        }
 
         logger.info(f"CTrader client initialized for {self.ws_uri}")
 
@@ -166,7 +365,6 @@ class CTraderClient:
     
     def start(self, on_tick_callback=None, on_bar_callback=None, on_execution_callback=None, on_account_callback=None):
         """Start the WebSocket client"""
-        import sys
         # Starting with callbacks registered
         logger.info("[CTRADER] Starting client...")
 
@@ -174,6 +372,7 @@ class CTraderClient:
         self.on_bar_callback = on_bar_callback
         self.on_execution_callback = on_execution_callback
         self.on_account_callback = on_account_callback
+        self._refresh_callback_flags()
         self._running = True
         
         # Creating WebSocket thread
@@ -185,6 +384,12 @@ class CTraderClient:
         # WebSocket thread started
         logger.info(f"[CTRADER] Thread started: {self._ws_thread.is_alive()}")
 
+    def _refresh_callback_flags(self):
+        """Recompute callback presence flags - call after (re)assigning callbacks"""
+        self._has_tick_cb = self.on_tick_callback is not None
+        self._has_bar_cb = self.on_bar_callback is not None
+        self._has_price_cb = bool(self._price_callbacks)
+
     def stop(self):
         """Stop the WebSocket client"""
         self._running = False
@@ -202,8 +407,13 @@ class CTraderClient:
     # Communication helpers
     # ------------------------------------------------------------
     
-    async def _send(self, payload_type: int, payload: Dict, expected_response_type: int = None, expected_symbol_id: int = None) -> str:
-        """Send message to cTrader server with proper request tracking"""
+    async def _send(self, payload_type: int, payload: Dict, expected_response_type: int = None, expected_symbol_id: int = None,
+                    track_response: bool = False) -> str:
+        """Send message to cTrader server with proper request tracking
+
+        track_response=True registers a Future (before the frame goes out) that
+        _recv_loop resolves by clientMsgId - await it through _receive().
+        """
         self._msg_id += 1
         client_msg_id = str(self._msg_id)
         msg = {
@@ -212,6 +422,16 @@ class CTraderClient:
             "payload": payload
         }
 
+        if track_response:
+            pending = self._pending_responses
+            pending[client_msg_id] = asyncio.get_running_loop().create_future()
+            if len(pending) > PENDING_RESPONSES_MAX:
+                # Lost responses must not pile up - fail the oldest waiter
+                old_id, old_fut = pending.popitem(last=False)
+                if not old_fut.done():
+                    old_fut.set_exception(asyncio.TimeoutError())
+                logger.warning(f"[SEND] Pending responses over {PENDING_RESPONSES_MAX}, evicted msgId={old_id}")
+
         # Register pending request for proper pairing
         if expected_response_type:
             self._pending_requests[client_msg_id] = {
@@ -247,10 +467,8 @@ class CTraderClient:
             raise RuntimeError("WS loop not ready")
 
         # Check authorization gate - queue if not ready
-        if not getattr(self, '_authorized', False):
+        if not self._authorized:
             logger.info(f"[WS] Not authorized yet → queueing send (type: {payload_type})")
-            if not hasattr(self, '_send_queue'):
-                self._send_queue = []
             self._send_queue.append((payload_type, payload))
             return "QUEUED"
 
@@ -292,12 +510,13 @@ class CTraderClient:
                 raise TimeoutError(f"Timeout waiting for {expected_type}")
 
             raw = await self.ws.recv()
+            self._now_ms = time.time_ns() // 1_000_000
             msg = json.loads(raw)
             pt = msg.get("payloadType")
             msg_id = msg.get("clientMsgId")
 
             # Only log received messages for non-frequent types
-            if pt not in [2131, 2125, 2120]:
+            if pt not in _QUIET_LOG_PTS:
                 logger.debug(f"[RECV_UNTIL] 📥 Received: type={pt}, msgId={msg_id}, expected={expected_type}")
 
             # Check for errors
@@ -341,7 +560,6 @@ class CTraderClient:
                             logger.debug(f"[RECV_UNTIL] ✅ AFTER FORWARD: Forwarding completed for msgId={msg_id}")
                         except Exception as e:
                             logger.error(f"[RECV_UNTIL] ❌ EXCEPTION CAUGHT: Error forwarding message: {e}")
-                            import traceback
                             logger.error(f"[RECV_UNTIL] Traceback: {traceback.format_exc()}")
                         logger.debug(f"[RECV_UNTIL] DEBUG: After try-except block, about to continue")
                         continue
@@ -354,10 +572,66 @@ class CTraderClient:
 
             # CRITICAL FIX: Forward ALL unexpected messages to main router instead of ignoring
             # Only log forwarding for non-frequent message types
-            if pt not in [2131, 2125]:  # Skip PT_SPOT_EVENT and PT_TRADER_RES
+            if pt not in _FREQUENT_PTS:  # Skip PT_SPOT_EVENT and PT_TRADER_RES
                 logger.info(f"[RECV_UNTIL] 📨 Forwarding unexpected message to main router: type={pt}")
             await self._route_message_to_main_handler(msg)
 
+    async def _recv_many(self, expected_type: int, expect_ids: set, timeout: float = 10.0) -> Dict[str, Any]:
+        """Collect responses for several in-flight requests with a single reader
+
+        Returns msgId -> message, or msgId -> RuntimeError for requests answered
+        with PT_ERROR_RES. Ids missing from the result timed out. All other
+        messages are forwarded to the main router.
+        """
+        results: Dict[str, Any] = {}
+        remaining = set(expect_ids)
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+
+        while remaining:
+            time_left = deadline - loop.time()
+            if time_left <= 0:
+                logger.error(f"[RECV_MANY] ❌ Timeout waiting for {expected_type} ({len(remaining)} outstanding) after {timeout}s")
+                for msg_id in remaining:
+                    self._pending_requests.pop(msg_id, None)
+                break
+
+            try:
+                raw = await asyncio.wait_for(self.ws.recv(), time_left)
+            except asyncio.TimeoutError:
+                continue
+            self._now_ms = time.time_ns() // 1_000_000
+            msg = json.loads(raw)
+            pt = msg.get("payloadType")
+            msg_id = msg.get("clientMsgId")
+
+            if msg_id in remaining:
+                if pt == PT_ERROR_RES:
+                    error = msg.get("payload", {})
+                    logger.error(f"[RECV_MANY] ❌ cTrader error for msgId={msg_id}: {error}")
+                    results[msg_id] = RuntimeError(f"cTrader error: {error}")
+                    self._pending_requests.pop(msg_id, None)
+                    remaining.discard(msg_id)
+                    continue
+
+                if pt == expected_type:
+                    # Validate symbolId for trendbars to prevent out-of-order confusion
+                    expected_symbol_id = self._pending_requests.get(msg_id, {}).get("symbol_id")
+                    response_symbol_id = msg.get("payload", {}).get("symbolId")
+                    if expected_symbol_id and response_symbol_id and int(response_symbol_id) != int(expected_symbol_id):
+                        logger.warning(f"[RECV_MANY] ⚠️ SYMBOL ID MISMATCH: got {response_symbol_id}, expected {expected_symbol_id}")
+                        await self._route_message_to_main_handler(msg)
+                        continue
+
+                    self._pending_requests.pop(msg_id, None)
+                    results[msg_id] = msg
+                    remaining.discard(msg_id)
+                    continue
+
+            await self._route_message_to_main_handler(msg)
+
+        return results
+
     async def _route_message_to_main_handler(self, msg: Dict):
         """Route message to appropriate handler in main receive loop"""
         # Removed debug entry log to reduce verbosity
@@ -365,11 +639,11 @@ class CTraderClient:
             pt = msg.get("payloadType")
             msg_id = msg.get("clientMsgId")
             # Only log routing for important message types
-            if pt not in [2131, 2125, 2120]:  # Skip frequent message types
+            if pt not in _QUIET_LOG_PTS:  # Skip frequent message types
                 logger.debug(f"[🔄 ROUTER] Routing message: type={pt}, msgId={msg_id}")
 
             if pt == PT_SPOT_EVENT:
-                self._handle_spot_event(msg.get("payload", {}))
+                self._handle_spot_event(msg.get("payload", {}), self._now_ms)
             elif pt == PT_ERROR_RES:
                 logger.error(f"cTrader ERROR (routed): {msg}")
             elif pt == PT_PONG_RES:
@@ -384,13 +658,13 @@ class CTraderClient:
             elif pt == PT_ORDER_ERROR_EVENT:
                 logger.warning(f"[🚨 ORDER ERROR] ORDER_ERROR_EVENT (routed): {msg}")
                 self._handle_order_error(msg)
-            elif pt in [PT_TRADER_RES, PT_POSITION_STATUS_EVENT]:
+            elif pt in _ACCOUNT_EVENT_PTS:
                 logger.info(f"[ACCOUNT] Account event (routed): {pt}")
                 self._handle_account_event(msg)
-            elif pt == 2134:  # PT_DEAL_LIST_RES
-                logger.debug(f"[💰 DEAL_LIST] DEBUG: About to call _handle_deal_list_response for msgId={msg_id}")
+            elif pt == PT_DEAL_LIST_RES:
+                logger.debug("%s About to call _handle_deal_list_response for msgId=%s", TAG_DEAL_LIST, msg_id)
                 self._handle_deal_list_response(msg)
-                logger.debug(f"[💰 DEAL_LIST] DEBUG: Returned from _handle_deal_list_response")
+                logger.debug("%s Returned from _handle_deal_list_response", TAG_DEAL_LIST)
             elif pt == PT_GET_TRENDBARS_RES:
                 logger.info(f"[📊 TRENDBARS] Processing out-of-order trendbars response (routed)")
                 # Handle out-of-order trendbars by matching to correct symbol
@@ -430,33 +704,8 @@ class CTraderClient:
             logger.info(f"[📊 TRENDBARS] Processing {len(arr)} bars for {symbol} (msgId: {msg_id})")
 
             if arr and self.on_bar_callback:
-                # Process similar to _bootstrap_history logic
-                processed = []
-                for i, bar in enumerate(arr):
-                    # Similar processing as in _bootstrap_history
-                    ts_ms = bar.get("utcTimestampInMinutes", 0) * 60 * 1000 if "utcTimestampInMinutes" in bar else 0
-
-                    low_int = bar.get("low", 0)
-                    delta_open = bar.get("deltaOpen", 0)
-                    delta_high = bar.get("deltaHigh", 0)
-                    delta_close = bar.get("deltaClose", 0)
-
-                    low_price = low_int / 100000.0
-                    open_price = (low_int + delta_open) / 100000.0
-                    high_price = (low_int + delta_high) / 100000.0
-                    close_price = (low_int + delta_close) / 100000.0
-
-                    ts_iso = datetime.fromtimestamp(ts_ms/1000.0, tz=timezone.utc).isoformat()
-
-                    processed.append({
-                        "timestamp": ts_iso,
-                        "open": open_price,
-                        "high": high_price,
-                        "low": low_price,
-                        "close": close_price,
-                        "volume": bar.get("volume", 0),
-                        "spread": 2.0 if "US100" in symbol else 1.5
-                    })
+                # Same decoding as _bootstrap_history
+                processed = _decode_trendbars(arr, payload.get("timestamp", 0), 2.0 if "US100" in symbol else 1.5)
 
                 if processed:
                     # Update bars storage
@@ -471,7 +720,6 @@ class CTraderClient:
                         else:
                             self.on_bar_callback(symbol, processed[-1], processed)
                     except Exception as e:
-                        import traceback
                         logger.error(f"[CTRADER] ❌ Error calling on_bar_callback for {symbol}: {e}")
                         logger.error(f"[CTRADER] Traceback: {traceback.format_exc()}")
                     logger.info(f"[📊 TRENDBARS] Sent {len(processed)} out-of-order bars for {symbol}")
@@ -480,15 +728,30 @@ class CTraderClient:
             logger.error(f"[📊 TRENDBARS] Error processing trendbars response for {symbol}: {e}")
 
     # helper: receive (pro stávající volání v kódu)
-    async def _receive(self, expect_type: int | None = None, expect_id: str | None = None):
+    async def _receive(self, expect_type: int | None = None, expect_id: str | None = None, timeout: float = 10.0):
         """
         Vrátí další zprávu, nebo čeká na konkrétní typ přes _recv_until.
         Zachovává stávající styl volání: await self._receive(PT_..., expect_id=...)
+
+        Pokud běží _recv_loop a request byl odeslán s track_response=True, čeká se
+        na Future (bez druhého ws.recv(), odpověď může přijít v libovolném pořadí).
         """
         if expect_type is None:
             raw = await self.ws.recv()
             return json.loads(raw)
-        msg = await self._recv_until(expect_type, expect_id=expect_id)
+        fut = self._pending_responses.get(expect_id) if expect_id else None
+        if fut is not None and self._recv_loop_active:
+            try:
+                return await asyncio.wait_for(fut, timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Timeout waiting for {expect_type}") from None
+            finally:
+                self._pending_responses.pop(expect_id, None)
+                self._pending_requests.pop(expect_id, None)
+        if fut is not None:
+            # No _recv_loop yet (startup) - read the socket directly
+            del self._pending_responses[expect_id]
+        msg = await self._recv_until(expect_type, expect_id=expect_id, timeout=timeout)
         return msg
 
     # ------------------------------------------------------------
@@ -498,7 +761,6 @@ class CTraderClient:
     def _run_loop(self):
         """Run the asyncio event loop in a thread"""
         
-        import sys
         # WebSocket run loop started
         
         try:
@@ -513,12 +775,10 @@ class CTraderClient:
         except Exception as e:
             logger.error(f"[CTRADER] WebSocket loop crashed: {e}")
             logger.error(f"[CTRADER] Thread crashed: {e}")
-            import traceback
             traceback.print_exc()
             
     async def connect_and_stream(self):
         """Main connection and streaming loop"""
-        import sys
         # Connection initialization
         
         logger.info(f"[CTRADER] connect_and_stream started, running={self._running}")
@@ -546,7 +806,6 @@ class CTraderClient:
             except Exception as e:
                 logger.error(f"[CONNECT] Connection error: {e}")
                 logger.error(f"WebSocket error: {e}")
-                import traceback
                 traceback.print_exc()
             
             if not self._running:
@@ -562,11 +821,15 @@ class CTraderClient:
     async def _connect(self):
         """Establish WebSocket connection"""
         logger.info(f"Connecting WS: {self.ws_uri}")
+        # Trusted JSON feed of tiny frames: skip permessage-deflate negotiation and
+        # the frame size cap; keep a deeper incoming queue for tick bursts
         self.ws = await websockets.connect(
             self.ws_uri, 
             ping_interval=20, 
             ping_timeout=20, 
-            max_size=8 * 1024 * 1024
+            compression=None,
+            max_size=None,
+            max_queue=1024
         )
         logger.info("Connected!")
 
@@ -581,6 +844,9 @@ class CTraderClient:
         if self.ctid_trader_account_id == 16612:
             raise RuntimeError(f"CRITICAL ERROR: ctid_trader_account_id is set to client_id (16612)! Should be actual trader account ID like 42478187")
 
+        # Reconnect: queue cross-thread sends and hold snapshots until this auth completes
+        self._authorized = False
+        self._account_ready.clear()
         logger.info(f"[AUTH] Starting auth with account: {self.ctid_trader_account_id}")
         logger.info(f"[AUTH] Client ID: {self.client_id}")
         logger.info(f"[AUTH] WebSocket URI: {self.ws_uri}")
@@ -669,17 +935,21 @@ class CTraderClient:
 
         # Set authorized flag and flush any queued sends
         self._authorized = True
+        self._account_ready.set()
         await self._flush_send_queue()
 
         logger.info(f"Symbol map built: {self.symbol_to_id}")
         
+        # Forming bars from a previous session would duplicate the bootstrapped ones
+        self._forming_bars.clear()
+
         # 5) TEPRVE TEĎ načíst historii (po vytvoření map!)
         if self.use_historical_bootstrap:
             logger.info("[BOOTSTRAP] Starting history bootstrap")
             await self._bootstrap_history()
         
         # 6) Také načíst z cache
-        self._load_history_on_startup()
+        await self._load_history_on_startup()
 
     # ------------------------------------------------------------
     # Subscription and message handling
@@ -738,52 +1008,107 @@ class CTraderClient:
             logger.error(f"[UNSUBSCRIBE] Error unsubscribing from symbols: {e}")
 
     async def _recv_loop(self):
-        """Main message receiving loop"""
-        while self._running and self.ws:
-            try:
-                raw = await self.ws.recv()
-                msg = json.loads(raw)
-                pt = msg.get("payloadType")
-
-                if pt == PT_SPOT_EVENT:
-                    self._handle_spot_event(msg.get("payload", {}))
-                elif pt == PT_ERROR_RES:
-                    logger.error(f"cTrader ERROR: {msg}")
-                elif pt == PT_PONG_RES:
-                    pass
-                elif pt == PT_NEW_ORDER_RES:
-                    logger.info(f"[🚨 ORDER RESPONSE] NEW_ORDER_RES: {msg}")
-                    self._handle_order_response(msg)
-                elif pt == PT_EXECUTION_EVENT:
-                    logger.info(f"[🚨 EXECUTION EVENT] EXECUTION_EVENT: {msg}")
-                    self._handle_execution_event(msg)
-                    # Also handle for account updates (margin, balance)
-                    self._handle_account_event(msg)
-                elif pt == PT_ORDER_ERROR_EVENT:
-                    logger.warning(f"[🚨 ORDER ERROR] ORDER_ERROR_EVENT: {msg}")
-                    self._handle_order_error(msg)
-                elif pt in [PT_TRADER_RES, PT_POSITION_STATUS_EVENT]:
-                    logger.info(f"[ACCOUNT] Account event: {pt}")
-                    self._handle_account_event(msg)
-                elif pt == 2134:  # PT_DEAL_LIST_RES
-                    logger.info(f"[💰 DEAL_LIST] Processing deal list response")
-                    self._handle_deal_list_response(msg)
-                else:
-                    # Skip logging for PT_SUBSCRIBE_DEPTH_QUOTES_REQ (type 2120) to reduce noise
-                    if pt != 2120:
+        """Main message receiving loop
+
+        Spot events are only parsed and queued here; _spot_consumer aggregates
+        them, so a burst of ticks doesn't stall decoding of other frames.
+        """
+        self._spot_queue = asyncio.Queue(maxsize=SPOT_QUEUE_MAXSIZE)
+        consumer = asyncio.create_task(self._spot_consumer(self._spot_queue))
+        pending = self._pending_responses
+        self._recv_loop_active = True
+        try:
+            while self._running and self.ws:
+                try:
+                    raw = await self.ws.recv()
+                    self._now_ms = time.time_ns() // 1_000_000
+                    msg = json.loads(raw)
+                    pt = msg.get("payloadType")
+
+                    # Awaited responses go straight to their caller, in any order
+                    if pending:
+                        fut = pending.pop(msg.get("clientMsgId"), None)
+                        if fut is not None:
+                            if not fut.done():
+                                if pt == PT_ERROR_RES:
+                                    fut.set_exception(RuntimeError(f"cTrader error: {msg.get('payload', {})}"))
+                                else:
+                                    fut.set_result(msg)
+                            continue
+
+                    handler = self._recv_handlers.get(pt)
+                    if handler is not None:
+                        handler(msg)
+                    else:
                         # Log unknown message types for debugging
                         logger.debug(f"[🚨 UNKNOWN MSG] Type {pt}: {msg}")
-                    pass
-            except Exception as e:
-                logger.error(f"recv_loop error: {e}")
-                break
+                except Exception as e:
+                    logger.error(f"recv_loop error: {e}")
+                    break
+        finally:
+            self._recv_loop_active = False
+            self._spot_queue = None
+            consumer.cancel()
+            # Nobody will resolve these any more - fail waiters now instead of at their timeout
+            for fut in pending.values():
+                if not fut.done():
+                    fut.set_exception(ConnectionError("recv_loop stopped"))
+            pending.clear()
+
+    def _recv_spot_event(self, msg: Dict):
+        """PT_SPOT_EVENT handler for _recv_loop - hand off to _spot_consumer"""
+        queue = self._spot_queue
+        if queue is None:
+            self._handle_spot_event(msg.get("payload", {}), self._now_ms)
+            return
+        try:
+            # Receive time travels with the tick - by the time it's consumed _now_ms belongs to a later frame
+            queue.put_nowait((self._now_ms, msg.get("payload", {})))
+        except asyncio.QueueFull:
+            # Drop stale ticks rather than block the receive loop
+            self._spot_dropped += 1
+            if self._spot_dropped % 1000 == 1:
+                logger.warning(f"[TICK] Spot queue full, dropped {self._spot_dropped} ticks so far")
+
+    async def _spot_consumer(self, queue: asyncio.Queue):
+        """Drain queued spot events into the M5 aggregation"""
+        while True:
+            recv_ms, payload = await queue.get()
+            self._handle_spot_event(payload, recv_ms)
+
+    def _recv_order_response(self, msg: Dict):
+        """NEW_ORDER_RES handler for _recv_loop"""
+        logger.info(f"[🚨 ORDER RESPONSE] NEW_ORDER_RES: {msg}")
+        self._handle_order_response(msg)
+
+    def _recv_execution_event(self, msg: Dict):
+        """EXECUTION_EVENT handler for _recv_loop"""
+        logger.info(f"[🚨 EXECUTION EVENT] EXECUTION_EVENT: {msg}")
+        self._handle_execution_event(msg)
+        # Also handle for account updates (margin, balance)
+        self._handle_account_event(msg)
+
+    def _recv_order_error(self, msg: Dict):
+        """ORDER_ERROR_EVENT handler for _recv_loop"""
+        logger.warning(f"[🚨 ORDER ERROR] ORDER_ERROR_EVENT: {msg}")
+        self._handle_order_error(msg)
+
+    def _recv_account_event(self, msg: Dict):
+        """PT_TRADER_RES / PT_POSITION_STATUS_EVENT handler for _recv_loop"""
+        logger.info(f"[ACCOUNT] Account event: {msg.get('payloadType')}")
+        self._handle_account_event(msg)
+
+    def _recv_deal_list(self, msg: Dict):
+        """PT_DEAL_LIST_RES handler for _recv_loop"""
+        logger.info("%s Processing deal list response", TAG_DEAL_LIST)
+        self._handle_deal_list_response(msg)
 
     # ------------------------------------------------------------
     # Market data processing - M5 aggregation
     # ------------------------------------------------------------
     
-    def _handle_spot_event(self, payload: Dict):
-        """Handle spot events with M5 aggregation"""
+    def _handle_spot_event(self, payload: Dict, recv_ms: int):
+        """Handle spot events with M5 aggregation (recv_ms = epoch ms the tick's frame was received)"""
         try:
             sid = payload.get("symbolId")
             bid = payload.get("bid")
@@ -795,115 +1120,153 @@ class CTraderClient:
             if not symbol:
                 return
 
+            # Hot path: bind per-tick containers once (LOAD_FAST instead of attribute lookups)
+            current_price = self.current_price
+            last_bar_block = self.last_bar_block
+            forming_bars = self._forming_bars
+
             bid_price = bid / 100000.0
             ask_price = ask / 100000.0
+            spread = ask_price - bid_price
 
-            first = symbol not in self.current_price
+            first = symbol not in current_price
             price_data = {
                 "bid": bid_price,
                 "ask": ask_price,
-                "spread": ask_price - bid_price,
+                "spread": spread,
                 "timestamp": datetime.now(timezone.utc),
             }
-            self.current_price[symbol] = price_data
+            current_price[symbol] = price_data
 
             # Notify price callbacks for account monitoring
-            if self._price_callbacks:
+            if self._has_price_cb:
                 self._notify_price_callbacks(sid, price_data)
             
             if first:
                 logger.info(f"[TICK] First spot for {symbol}: {bid_price:.2f}/{ask_price:.2f}")
 
             # Initialize structures
-            if symbol not in self.bars:
-                self.bars[symbol] = deque(maxlen=500)
-                self.last_bar_block[symbol] = None
+            symbol_bars = self.bars.get(symbol)
+            if symbol_bars is None:
+                symbol_bars = self.bars[symbol] = deque(maxlen=500)
+                last_bar_block[symbol] = None
 
             # === M5 AGGREGATION (OPRAVENÁ) ===
-            now = datetime.now(timezone.utc)
-            current_5min_block = now.replace(
-                minute=(now.minute // 5) * 5,
-                second=0,
-                microsecond=0
-            )
+            # Integer block math on the tick's receive time - no datetime per tick
+            current_5min_block = _m5_block_ms(recv_ms)
 
-            prev_block = self.last_bar_block.get(symbol)
+            prev_block = last_bar_block.get(symbol)
+            forming = forming_bars.get(symbol)
 
             # Check if we need new M5 bar
             if prev_block is None or current_5min_block != prev_block:
                 # DŮLEŽITÉ: Poslat UZAVŘENÝ bar, ne nový!
-                if prev_block is not None and len(self.bars[symbol]) > 0:
-                    closed_bar = dict(self.bars[symbol][-1])  # Kopie uzavřeného baru
-                    logger.info(f"[M5] Closing bar for {symbol} at {prev_block.strftime('%H:%M')}: "
+                if prev_block is not None and forming is not None:
+                    closed_bar = _bar_from_slots(forming)
+                    symbol_bars.append(closed_bar)
+                    logger.info(f"[M5] Closing bar for {symbol} at {_hhmm_from_ms(prev_block)}: "
                             f"O:{closed_bar['open']:.2f} H:{closed_bar['high']:.2f} "
                             f"L:{closed_bar['low']:.2f} C:{closed_bar['close']:.2f}")
                     
-                    # Poslat VŽDY, bez podmínky warmup
-                    if self.on_bar_callback:
-                        try:
-                            self.on_bar_callback(symbol, closed_bar)
-                        except Exception as e:
-                            import traceback
-                            logger.error(f"[CTRADER] ❌ Error calling on_bar_callback for closed bar {symbol}: {e}")
-                            logger.error(f"[CTRADER] Traceback: {traceback.format_exc()}")
-                        logger.debug(f"[M5] Sent closed bar to main.py")
+                    # Poslat VŽDY, bez podmínky warmup - all symbols closing on the same
+                    # M5 boundary are dispatched together in one event loop turn
+                    if self._has_bar_cb:
+                        self._queue_closed_bar(symbol, closed_bar)
                 
-                # Vytvořit NOVÝ bar
-                current_spread = self.current_price[symbol].get("spread", 0) if symbol in self.current_price else 0
-                bar = {
-                    "timestamp": now.isoformat(),
-                    "open": bid_price,
-                    "high": bid_price,
-                    "low": bid_price,
-                    "close": bid_price,
-                    "volume": 1,
-                    "spread": current_spread,
-                }
-                self.bars[symbol].append(bar)
-                self.last_bar_block[symbol] = current_5min_block
+                # Vytvořit NOVÝ bar (drží se mimo self.bars, dokud se neuzavře)
+                forming_bars[symbol] = [_iso_from_ms(current_5min_block), bid_price, bid_price, bid_price, bid_price, 1, spread]
+                last_bar_block[symbol] = current_5min_block
                 
-                logger.debug(f"[M5] New bar started for {symbol} at {current_5min_block.strftime('%H:%M')}")
+                logger.debug(f"[M5] New bar started for {symbol} at {_hhmm_from_ms(current_5min_block)}")
                 # NEPOSÍLAT nový bar - počkat až bude uzavřený!
                 
             else:
                 # Update current M5 bar
-                if len(self.bars[symbol]) > 0:
-                    bar = self.bars[symbol][-1]
-                    bar["high"] = max(bar["high"], bid_price)
-                    bar["low"] = min(bar["low"], bid_price)
-                    bar["close"] = bid_price
-                    bar["volume"] = bar.get("volume", 0) + 1
-                    bar["spread"] = self.current_price[symbol].get("spread", 0)
+                if forming is None and len(symbol_bars) > 0:
+                    # Same block as the last history/cache bar - continue aggregating that bar
+                    last = symbol_bars.pop()
+                    forming = [last.get(field, 0) for field in BAR_FIELDS]
+                    forming_bars[symbol] = forming
+                if forming is not None:
+                    # Aggregation kernel - kept inline in pure Python on purpose: numba/numpy
+                    # are not available on the AppDaemon image and a call into JIT code
+                    # would cost more than these few scalar operations.
+                    if bid_price > forming[_HIGH]:
+                        forming[_HIGH] = bid_price
+                    if bid_price < forming[_LOW]:
+                        forming[_LOW] = bid_price
+                    forming[_CLOSE] = bid_price
+                    forming[_VOLUME] += 1
+                    forming[_SPREAD] = spread
 
             # Tick callback stále běží
-            if self.on_tick_callback:
-                self.on_tick_callback(symbol, self.current_price[symbol])
+            if self._has_tick_cb:
+                self.on_tick_callback(symbol, price_data)
                 
         except Exception as e:
             logger.error(f"Error in _handle_spot_event: {e}")
             
 
+    def _queue_closed_bar(self, symbol: str, closed_bar: Dict):
+        """Queue closed bar and schedule one fanout for the current event loop turn"""
+        self._pending_closed_bars.append((symbol, closed_bar, None))
+        if len(self._pending_closed_bars) > 1:
+            return  # Flush already scheduled
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon(self._flush_closed_bars)
+        else:
+            self._flush_closed_bars()
+
+    def _flush_closed_bars(self):
+        """Dispatch all closed bars queued during the last event loop turn"""
+        updates, self._pending_closed_bars = self._pending_closed_bars, []
+        self._fanout_bars(updates)
+        logger.debug(f"[M5] Sent {len(updates)} closed bar(s) to main.py")
+
+    def _fanout_bars(self, updates: List[tuple]):
+        """Deliver (symbol, bar, history) updates to on_bar_callback in one pass"""
+        if not self.on_bar_callback:
+            return
+        for symbol, bar, history in updates:
+            try:
+                if history is None:
+                    self.on_bar_callback(symbol, bar)
+                else:
+                    self.on_bar_callback(symbol, bar, history)
+            except Exception as e:
+                logger.error(f"[CTRADER] ❌ Error calling on_bar_callback for {symbol}: {e}")
+                logger.error(f"[CTRADER] Traceback: {traceback.format_exc()}")
+
     async def _bootstrap_history(self, count: int = 300):
         """Stáhnout historické M5 bary z cTrader API"""
-        import sys
         logger.info(f"[BOOTSTRAP] Starting with {len(self.symbol_to_id)} symbols")
 
+        # Callbacks and cache writes are collected and done in one batch after all symbols are loaded
+        bar_updates: List[tuple] = []
+        pending_cache: Dict[str, List[Dict]] = {}
+
         # Symbol maps are already built before this point
         
         now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
         from_ms = now_ms - count * 5 * 60 * 1000
 
-        # Warm-up request to avoid first-request errors
-        try:
-            # Sending warm-up request
-            first_symbol_id = list(self.symbol_to_id.values())[0]
-            await self._send(PT_GET_TRENDBARS_REQ, {
+        # Request payloads differ only by symbolId - build them once for warm-up, requests and retries
+        trendbar_payloads = {
+            int(symbol_id): {
                 "ctidTraderAccountId": self.ctid_trader_account_id,
-                "symbolId": int(first_symbol_id),
+                "symbolId": int(symbol_id),
                 "period": PERIOD_M5,
                 "fromTimestamp": from_ms,
                 "toTimestamp": now_ms
-            })
+            }
+            for symbol_id in self.symbol_to_id.values()
+        }
+
+        # Warm-up request to avoid first-request errors
+        try:
+            # Sending warm-up request
+            first_symbol_id = int(list(self.symbol_to_id.values())[0])
+            await self._send(PT_GET_TRENDBARS_REQ, trendbar_payloads[first_symbol_id])
             # Don't wait for response, just send to warm up
             await asyncio.sleep(0.5)
             # Warm-up complete, proceeding
@@ -911,196 +1274,101 @@ class CTraderClient:
             # Warm-up request failed (expected)
             pass
 
-        for symbol, symbol_id in self.symbol_to_id.items():
-            try:
-                # Processing {symbol} (ID: {symbol_id})
-
+        # Pipeline requests in batches: the websocket allows a single pending recv(),
+        # so responses for a whole batch are collected by one reader (_recv_many)
+        symbols = list(self.symbol_to_id.items())
+        for start in range(0, len(symbols), BOOTSTRAP_BATCH_SIZE):
+            batch = symbols[start:start + BOOTSTRAP_BATCH_SIZE]
+            in_flight: Dict[str, str] = {}  # msgId -> symbol
 
-                # Generate unique message ID for tracking
-                msg_id = await self._send(PT_GET_TRENDBARS_REQ, {
-                    "ctidTraderAccountId": self.ctid_trader_account_id,
-                    "symbolId": int(symbol_id),
-                    "period": PERIOD_M5,
-                    "fromTimestamp": from_ms,
-                    "toTimestamp": now_ms
-                }, expected_response_type=PT_GET_TRENDBARS_RES, expected_symbol_id=int(symbol_id))
+            for symbol, symbol_id in batch:
+                try:
+                    # Generate unique message ID for tracking
+                    msg_id = await self._send(PT_GET_TRENDBARS_REQ, trendbar_payloads[int(symbol_id)],
+                                              expected_response_type=PT_GET_TRENDBARS_RES, expected_symbol_id=int(symbol_id))
+                    in_flight[msg_id] = symbol
+                except Exception as send_e:
+                    logger.warning(f"[BOOTSTRAP] Error for {symbol}: {send_e} - trying cache fallback")
+                    await self._bootstrap_from_cache(symbol, bar_updates, "after error")
+
+            responses = await self._recv_many(PT_GET_TRENDBARS_RES, set(in_flight), timeout=15.0)
+
+            for msg_id, symbol in in_flight.items():
+                symbol_id = self.symbol_to_id[symbol]
+                try:
+                    res = responses.get(msg_id)
+                    if res is None:
+                        # Timeout is OK - response may arrive out-of-order and be handled by router
+                        logger.warning(f"[BOOTSTRAP] Timeout waiting for {symbol} (msgId={msg_id}) - response may arrive out-of-order")
+                        logger.info(f"[BOOTSTRAP] Continuing - out-of-order handler will process response if it arrives")
+                        await self._bootstrap_from_cache(symbol, bar_updates, "")
+                        continue
 
-                # Sent trendbars request for {symbol}
+                    if isinstance(res, Exception):
+                        # Handle first-request errors with retry
+                        if "unsubscribe" not in str(res).lower():
+                            # For other errors, try cache as fallback before giving up
+                            logger.warning(f"[BOOTSTRAP] Error for {symbol}: {res} - trying cache fallback")
+                            await self._bootstrap_from_cache(symbol, bar_updates, "after error")
+                            continue
 
-                try:
-                    res = await self._recv_until(PT_GET_TRENDBARS_RES, expect_id=msg_id, timeout=15.0)
-                    payload = res.get("payload", {})
-                    res_msg_id = res.get("clientMsgId", "unknown")
-                    response_symbol_id = payload.get("symbolId", "missing")
-
-                    # Received response for {symbol}
-                except TimeoutError as timeout_e:
-                    # Timeout is OK - response may arrive out-of-order and be handled by router
-                    logger.warning(f"[BOOTSTRAP] Timeout waiting for {symbol} (msgId={msg_id}) - response may arrive out-of-order")
-                    logger.info(f"[BOOTSTRAP] Continuing - out-of-order handler will process response if it arrives")
-                    # Try to load from cache as fallback
-                    cached_bars = self._load_cached_bars(symbol)
-                    if cached_bars:
-                        logger.info(f"[BOOTSTRAP] Using cached data for {symbol}: {len(cached_bars)} bars")
-                        self.bars[symbol] = deque(cached_bars[-500:], maxlen=500)
-                        if self.on_bar_callback and len(cached_bars) > 0:
-                            self.on_bar_callback(symbol, cached_bars[-1], cached_bars)
-                    continue
-                except Exception as recv_e:
-                    # Handle first-request errors with retry
-                    if "unsubscribe" in str(recv_e).lower():
                         logger.info(f"[BOOTSTRAP] Retrying request for {symbol}...")
                         try:
                             await asyncio.sleep(1.0)
-                            retry_msg_id = await self._send(PT_GET_TRENDBARS_REQ, {
-                                "ctidTraderAccountId": self.ctid_trader_account_id,
-                                "symbolId": int(symbol_id),
-                                "period": PERIOD_M5,
-                                "fromTimestamp": from_ms,
-                                "toTimestamp": now_ms
-                            }, expected_response_type=PT_GET_TRENDBARS_RES, expected_symbol_id=int(symbol_id))
+                            retry_msg_id = await self._send(PT_GET_TRENDBARS_REQ, trendbar_payloads[int(symbol_id)],
+                                                            expected_response_type=PT_GET_TRENDBARS_RES, expected_symbol_id=int(symbol_id))
                             res = await self._recv_until(PT_GET_TRENDBARS_RES, expect_id=retry_msg_id, timeout=15.0)
-                            payload = res.get("payload", {})
                             logger.info(f"[BOOTSTRAP] Retry successful for {symbol}")
-
-                            # Debug retry payload
-                            retry_arr = payload.get("trendbar", [])
-                            if retry_arr:
-                                first_bar = retry_arr[0]
-                                low_int = first_bar.get("low", 0)
-                                delta_open = first_bar.get("deltaOpen", 0)
-                                open_price = (low_int + delta_open) / 100000.0
-                                # Retry successful, data retrieved
                         except Exception as retry_e:
                             logger.error(f"[BOOTSTRAP] Retry failed for {symbol}: {retry_e}")
-                            # Try cache as fallback
-                            cached_bars = self._load_cached_bars(symbol)
-                            if cached_bars:
-                                logger.info(f"[BOOTSTRAP] Using cached data after retry failure: {len(cached_bars)} bars")
-                                self.bars[symbol] = deque(cached_bars[-500:], maxlen=500)
-                                if self.on_bar_callback and len(cached_bars) > 0:
-                                    self.on_bar_callback(symbol, cached_bars[-1], cached_bars)
+                            await self._bootstrap_from_cache(symbol, bar_updates, "after retry failure")
                             continue
-                    else:
-                        # For other errors, try cache as fallback before giving up
-                        logger.warning(f"[BOOTSTRAP] Error for {symbol}: {recv_e} - trying cache fallback")
-                        cached_bars = self._load_cached_bars(symbol)
-                        if cached_bars:
-                            logger.info(f"[BOOTSTRAP] Using cached data after error: {len(cached_bars)} bars")
-                            self.bars[symbol] = deque(cached_bars[-500:], maxlen=500)
-                            if self.on_bar_callback and len(cached_bars) > 0:
-                                self.on_bar_callback(symbol, cached_bars[-1], cached_bars)
-                        continue
 
-                arr = payload.get("trendbar", [])
-                base_timestamp = payload.get("timestamp", 0)
+                    self._apply_bootstrap_payload(symbol, res.get("payload", {}), bar_updates, pending_cache)
 
-                logger.info(f"[BOOTSTRAP] Retrieved {len(arr)} bars for {symbol}")
+                except Exception as e:
+                    logger.error(f"[BOOTSTRAP] Error processing {symbol}: {e}")
+                    traceback.print_exc()
 
-                # Debug: Show payload content verification
-                payload_symbol_id = payload.get("symbolId", "missing")
+            if start + BOOTSTRAP_BATCH_SIZE < len(symbols):
+                await asyncio.sleep(1.0)  # Rate limit between batches
 
-                # Debug: Show first bar data to verify correct symbol data
-                if arr:
-                    first_bar = arr[0]
-                    low_int = first_bar.get("low", 0)
-                    delta_open = first_bar.get("deltaOpen", 0)
-                    open_price = (low_int + delta_open) / 100000.0
-                    # Processing first bar for {symbol}
-                
-                processed = []
-                current_open = None  # Začít s None
-                
-                # NAHRADIT celou sekci zpracování barů:
-                # NAHRADIT celou sekci zpracování (řádky ~460-490):
-                # NAHRADIT celou sekci zpracování (řádky ~460-490):
-                for i, bar in enumerate(arr):
-                    # Timestamp
-                    if "utcTimestampInMinutes" in bar:
-                        ts_ms = bar["utcTimestampInMinutes"] * 60 * 1000
-                    else:
-                        ts_ms = base_timestamp + (i * 5 * 60 * 1000)
-                    
-                    # SPRÁVNÉ DEKÓDOVÁNÍ - vše je relativní k LOW!
-                    low_int = bar.get("low", 0)  # Absolutní hodnota
-                    delta_open = bar.get("deltaOpen", 0)
-                    delta_high = bar.get("deltaHigh", 0)
-                    delta_close = bar.get("deltaClose", 0)
-                    
-                    # Všechny ceny počítáme od LOW
-                    low_price = low_int / 100000.0
-                    open_price = (low_int + delta_open) / 100000.0
-                    high_price = (low_int + delta_high) / 100000.0
-                    close_price = (low_int + delta_close) / 100000.0
-                    
-                    # Sanity check - high musí být nejvyšší, low nejnižší
-                    if high_price < max(open_price, close_price):
-                        high_price = max(open_price, close_price)
-                    if low_price > min(open_price, close_price):
-                        low_price = min(open_price, close_price)
-                    
-                    bar_range = high_price - low_price
-                    
-                    # Debug pro prvních pár barů
-                    if i < 3:
-                        print(f"Bar {i}: O={open_price:.2f}, H={high_price:.2f}, L={low_price:.2f}, C={close_price:.2f}, Range={bar_range:.2f}")
-                    
-                    # M5 může mít rozsah až 100-150 bodů při volatilitě
-                    if bar_range > 200:
-                        print(f"[WARNING] Bar {i}: unusually high range {bar_range:.1f}")
-                    
-                    if bar_range < 0:
-                        print(f"[ERROR] Bar {i}: negative range, skipping")
-                        continue
-                    
-                    ts_iso = datetime.fromtimestamp(ts_ms/1000.0, tz=timezone.utc).isoformat()
-                    
-                    # Estimate historical spread (bootstrap doesn't have tick data)
-                    # Use typical spread for indices (DAX ~1.5-2 pips, NASDAQ ~2-3 pips)
-                    typical_spread = 2.0 if "US100" in symbol else 1.5
-
-                    processed.append({
-                        "timestamp": ts_iso,
-                        "open": open_price,
-                        "high": high_price,
-                        "low": low_price,
-                        "close": close_price,
-                        "volume": bar.get("volume", 0),
-                        "spread": typical_spread
-                    })
-                                
-                if processed:
-                    logger.info(f"[BOOTSTRAP] Processed {len(processed)} bars for {symbol}")
-                    
-                    self.bars[symbol] = deque(processed[-500:], maxlen=500)
+        if bar_updates:
+            logger.info(f"[BOOTSTRAP] Sending history for {len(bar_updates)} symbols to main application")
+            self._fanout_bars(bar_updates)
 
-                    # Critical debug: verify data is different between symbols
-                    if processed:
-                        first_bar = processed[0]
-                        last_bar = processed[-1]
-                        # Data validation complete for {symbol}
-                    
-                    last_dt = datetime.fromisoformat(processed[-1]["timestamp"])
-                    self.last_bar_block[symbol] = last_dt.replace(
-                        minute=(last_dt.minute//5)*5,
-                        second=0,
-                        microsecond=0
-                    )
-                    
-                    if self.on_bar_callback:
-                        # Sending {symbol} data to main application
-                        self.on_bar_callback(symbol, processed[-1], processed)
-                        # {symbol} data sent successfully
-                    
-                    self._save_to_cache(symbol, processed)
-                    
+        if pending_cache:
+            try:
+                await asyncio.to_thread(self._save_all_to_cache, pending_cache)
             except Exception as e:
-                logger.error(f"[BOOTSTRAP] Error processing {symbol}: {e}")
-                import traceback
-                traceback.print_exc()
-            
-            await asyncio.sleep(1.0)  # Longer delay between symbols
+                logger.error(f"[BOOTSTRAP] Failed to write history cache: {e}")
                     
+    def _apply_bootstrap_payload(self, symbol: str, payload: Dict, bar_updates: List[tuple],
+                                 pending_cache: Dict[str, List[Dict]]):
+        """Decode one PT_GET_TRENDBARS_RES payload into bar storage"""
+        arr = payload.get("trendbar", [])
+        logger.info(f"[BOOTSTRAP] Retrieved {len(arr)} bars for {symbol}")
+
+        # Estimate historical spread (bootstrap doesn't have tick data)
+        # Use typical spread for indices (DAX ~1.5-2 pips, NASDAQ ~2-3 pips)
+        typical_spread = 2.0 if "US100" in symbol else 1.5
+        processed = _decode_trendbars(arr, payload.get("timestamp", 0), typical_spread)
+
+        if processed:
+            logger.info(f"[BOOTSTRAP] Processed {len(processed)} bars for {symbol}")
+            self.bars[symbol] = deque(processed[-500:], maxlen=500)
+            self.last_bar_block[symbol] = _m5_block_from_iso(processed[-1]["timestamp"])
+            bar_updates.append((symbol, processed[-1], processed))
+            pending_cache[symbol] = processed
+
+    async def _bootstrap_from_cache(self, symbol: str, bar_updates: List[tuple], reason: str):
+        """Fallback for a failed bootstrap request - use cached bars if fresh"""
+        cached_bars = await asyncio.to_thread(self._load_cached_bars, symbol)
+        if cached_bars:
+            logger.info(f"[BOOTSTRAP] Using cached data for {symbol} {reason}: {len(cached_bars)} bars")
+            self.bars[symbol] = deque(cached_bars[-500:], maxlen=500)
+            bar_updates.append((symbol, cached_bars[-1], cached_bars))
+
     def _load_cached_bars(self, symbol: str) -> List[Dict]:
         """Načíst bary z JSONL cache"""
         cache_path = f"{self.history_cache_dir}/{symbol}_M5.jsonl"
@@ -1169,7 +1437,7 @@ class CTraderClient:
             self.bars[symbol] = deque(processed_bars, maxlen=500)
             
             # Uložit do cache pro příště
-            self._save_to_cache(symbol, processed_bars)
+            self._save_to_cache_sync(symbol, processed_bars)
             
             # Okamžitě zavolat callback s daty
             if self.on_bar_callback and len(processed_bars) >= self.bar_warmup:
@@ -1177,7 +1445,13 @@ class CTraderClient:
                 self.on_bar_callback(symbol, processed_bars[-1], processed_bars)
                 logger.info(f"Bootstrap: Sent {len(processed_bars)} bars for {symbol}")
     
-    def _save_to_cache(self, symbol: str, bars: List[Dict]):
+    def _save_all_to_cache(self, bars_by_symbol: Dict[str, List[Dict]]):
+        """Uložit bary všech symbolů do cache v jednom průchodu"""
+        for symbol, bars in bars_by_symbol.items():
+            self._save_to_cache_sync(symbol, bars)
+        logger.info(f"[CACHE] Saved history for {len(bars_by_symbol)} symbols")
+
+    def _save_to_cache_sync(self, symbol: str, bars: List[Dict]):
         """Uložit bary do cache"""
         os.makedirs(self.history_cache_dir, exist_ok=True)
         cache_path = f"{self.history_cache_dir}/{symbol}_M5.jsonl"
@@ -1198,42 +1472,60 @@ class CTraderClient:
                 # Zapsat serializovatelný bar
                 f.write(json.dumps(bar_copy) + "\n")
                 
-    def _load_history_on_startup(self):
-        """Načíst historii při startu z cache"""
-        import os
-        import json
-        
+    def _scan_cache_files(self) -> Dict[str, str]:
+        """Map cache file name -> path, scanning each search dir once (first dir wins)"""
+        cache_files: Dict[str, str] = {}
+        for cache_dir in self._cache_search_dirs:
+            try:
+                with os.scandir(cache_dir) as entries:
+                    for entry in entries:
+                        if entry.name.endswith("_M5.jsonl") and entry.name not in cache_files:
+                            cache_files[entry.name] = entry.path
+                            if cache_dir != self.history_cache_dir:
+                                logger.info(f"[CACHE] Found cache at alternate path: {entry.path}")
+            except OSError:
+                continue
+        return cache_files
+
+    @staticmethod
+    def _read_cache_file(cache_path: str) -> List[Dict]:
+        """Načíst bary z jednoho JSONL souboru"""
+        bars = []
+        with open(cache_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    bars.append(json.loads(line))
+        return bars
+
+    async def _load_history_on_startup(self):
+        """Načíst historii při startu z cache
+
+        File reads run concurrently in the default thread pool; bar state is
+        updated back on the event loop.
+        """
         logger.info(f"[CACHE] Loading history from {self.history_cache_dir}")
-        
+        bar_updates: List[tuple] = []
+        cache_files = await asyncio.to_thread(self._scan_cache_files)
+
+        to_load = []
         for symbol in self.symbol_to_id.keys():
+            cache_path = cache_files.get(f"{symbol}_M5.jsonl")
+            if cache_path is None:
+                logger.info(f"[CACHE] No cache found for {symbol}")
+            else:
+                to_load.append((symbol, cache_path))
+
+        results = await asyncio.gather(
+            *[asyncio.to_thread(self._read_cache_file, cache_path) for _, cache_path in to_load],
+            return_exceptions=True
+        )
+        
+        for (symbol, cache_path), bars in zip(to_load, results):
             try:
-                # Primární cesta
-                cache_path = f"{self.history_cache_dir}/{symbol}_M5.jsonl"
-                
-                # Pokud neexistuje, zkusit alternativní cesty
-                if not os.path.exists(cache_path):
-                    alt_paths = [
-                        f"./cache/{symbol}_M5.jsonl",
-                        f"/config/cache/{symbol}_M5.jsonl",
-                        f"cache/{symbol}_M5.jsonl"
-                    ]
-                    for alt in alt_paths:
-                        if os.path.exists(alt):
-                            cache_path = alt
-                            logger.info(f"[CACHE] Found cache at alternate path: {alt}")
-                            break
-                    else:
-                        logger.info(f"[CACHE] No cache found for {symbol}")
-                        continue
-                
-                # Načíst bary
-                bars = []
-                with open(cache_path, 'r') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line:
-                            bars.append(json.loads(line))
-                
+                if isinstance(bars, BaseException):
+                    raise bars
+
                 if bars:
                     # Vzít posledních 100 barů
                     self.bars[symbol] = deque(bars[-100:], maxlen=500)
@@ -1242,31 +1534,21 @@ class CTraderClient:
                     # Nastavit last_bar_block podle posledního baru
                     last_timestamp = bars[-1].get('timestamp')
                     if last_timestamp:
-                        # Parse timestamp
-                        if 'T' in last_timestamp:
-                            last_dt = datetime.fromisoformat(last_timestamp.replace('Z', '+00:00'))
-                        else:
-                            last_dt = datetime.fromisoformat(last_timestamp)
-                        
-                        self.last_bar_block[symbol] = last_dt.replace(
-                            minute=(last_dt.minute // 5) * 5,
-                            second=0,
-                            microsecond=0
-                        )
+                        self.last_bar_block[symbol] = _m5_block_from_iso(last_timestamp)
                         logger.debug(f"[CACHE] Set last_bar_block for {symbol} to {self.last_bar_block[symbol]}")
                     
-                    # DŮLEŽITÉ: Poslat všechny bary do main.py OKAMŽITĚ
-                    if self.on_bar_callback and len(bars) > 0:
-                        # Poslat poslední bar a všechna historická data
-                        self.on_bar_callback(symbol, bars[-1], bars)
-                        logger.info(f"[CACHE] Sent {len(bars)} historical bars to main.py for {symbol}")
+                    # DŮLEŽITÉ: Poslat všechny bary do main.py (jednou dávkou za všechny symboly)
+                    bar_updates.append((symbol, bars[-1], bars))
                 else:
                     logger.info(f"[CACHE] Cache file empty for {symbol}")
                     
             except Exception as e:
                 logger.error(f"[CACHE] Failed to load cache for {symbol}: {e}")
-                import traceback
                 logger.error(traceback.format_exc())
+
+        if bar_updates and self.on_bar_callback:
+            self._fanout_bars(bar_updates)
+            logger.info(f"[CACHE] Sent historical bars to main.py for {len(bar_updates)} symbols")
                 
         def set_event_bridge(self, bridge):
             """Set the event bridge for thread-safe communication"""
@@ -1300,6 +1582,7 @@ class CTraderClient:
 
         if execution_type == 3:  # ORDER_FILLED
             logger.info(f"[🚨 POSITION OPENED] Order filled! Position created: {payload}")
+            self._invalidate_snapshot("ORDER_FILLED")
             # Notify order executor that position is actually open
             if self.on_execution_callback or self._execution_callbacks:
                 try:
@@ -1353,24 +1636,24 @@ class CTraderClient:
 
     async def _flush_send_queue(self):
         """Flush queued sends after authorization"""
-        if not hasattr(self, '_send_queue'):
-            return
-
-        queue = getattr(self, '_send_queue', [])
-        if not queue:
+        if not self._send_queue:
             return
+        # Swap before awaiting so sends queued meanwhile aren't wiped by the reset
+        queue, self._send_queue = self._send_queue, []
 
         logger.info(f"[WS] Flushing {len(queue)} queued sends after authorization")
 
-        for payload_type, payload in queue:
-            try:
-                await self._send(payload_type, payload)
+        # Schedule all writes at once (started in queue order) instead of one await per send
+        results = await asyncio.gather(
+            *(self._send(payload_type, payload) for payload_type, payload in queue),
+            return_exceptions=True
+        )
+        for (payload_type, _), result in zip(queue, results):
+            if isinstance(result, Exception):
+                logger.error(f"[WS] Failed to flush queued send (type {payload_type}): {result}")
+            else:
                 logger.debug(f"[WS] Flushed queued send: type {payload_type}")
-            except Exception as e:
-                logger.error(f"[WS] Failed to flush queued send: {e}")
 
-        # Clear queue
-        self._send_queue = []
         logger.info("[WS] Send queue flushed")
 
     # ------------------------------------------------------------
@@ -1380,12 +1663,12 @@ class CTraderClient:
     async def request_deals_list(self, from_timestamp=None, to_timestamp=None, max_rows=1000):
         """Request deals list for balance and PnL calculation - CRITICAL FIX"""
         try:
+            now_ms = _epoch_ms()
             if from_timestamp is None:
-                today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-                from_timestamp = int(today.timestamp() * 1000)
+                from_timestamp = now_ms - now_ms % DAY_MS  # Today 00:00 UTC
 
             if to_timestamp is None:
-                to_timestamp = int(datetime.now(timezone.utc).timestamp() * 1000)
+                to_timestamp = now_ms
 
             payload = {
                 "ctidTraderAccountId": self.ctid_trader_account_id,
@@ -1394,26 +1677,36 @@ class CTraderClient:
                 "maxRows": max_rows
             }
 
-            logger.info(f"[💰 DEAL_REQ] Requesting deals list from {from_timestamp} to {to_timestamp}, max_rows={max_rows}")
+            logger.info("%s Requesting deals list from %s to %s, max_rows=%s", TAG_DEAL_REQ, from_timestamp, to_timestamp, max_rows)
 
             # FIRE-AND-FORGET: Send request and let recv_loop handle response automatically
             mid = await self._send(PT_DEAL_LIST_REQ, payload, expected_response_type=PT_DEAL_LIST_RES)
-            logger.info(f"[💰 DEAL_REQ] ✅ Sent deals request with msgId={mid}, response will be handled by recv_loop")
+            logger.info("%s Sent deals request with msgId=%s, response will be handled by recv_loop", TAG_DEAL_REQ, mid)
 
             # Don't wait for response - recv_loop will automatically route PT_DEAL_LIST_RES to _handle_deal_list_response
             return mid
 
         except Exception as e:
-            logger.error(f"[💰 DEAL_REQ] Error requesting deals list: {e}")
+            logger.error("%s Error requesting deals list: %s", TAG_DEAL_REQ, e)
             return None
 
     async def _get_account_snapshot(self):
         """Get account snapshot after authorization - uses PT_DEAL_LIST_REQ for balance and PT_TRADER_REQ for positions"""
         logger.info("[ACCOUNT] _get_account_snapshot() - Getting initial balance and positions")
+        cached = self._snapshot_cache
+        if cached and time.monotonic() - cached['ts'] < self._snapshot_ttl:
+            logger.info(f"[ACCOUNT] Using cached snapshot: {cached['balance']:,.2f} {self.account_currency}")
+            self._emit_snapshot_callback(cached['balance'])
+            return
+
         try:
             # CRITICAL FIX: Wait for account to fully initialize after authorization
-            logger.info("[ACCOUNT] Waiting 1s for account initialization...")
-            await asyncio.sleep(1.0)
+            if not self._account_ready.is_set():
+                logger.info("[ACCOUNT] Waiting for account initialization...")
+                try:
+                    await asyncio.wait_for(self._account_ready.wait(), timeout=5.0)
+                except asyncio.TimeoutError:
+                    logger.warning("[ACCOUNT] Account not ready after 5s, requesting snapshot anyway")
 
             # CRITICAL FIX: Request PT_TRADER_RES for positions data (needed by AccountStateMonitor)
             logger.info("[ACCOUNT] Requesting PT_TRADER_REQ for positions data...")
@@ -1427,88 +1720,69 @@ class CTraderClient:
             # Use PT_DEAL_LIST_REQ instead to get balance from last deal
             logger.info("[ACCOUNT] Using PT_DEAL_LIST_REQ for initial balance (more reliable for demo)")
 
-            # Request last 7 days of deals to get most recent balance
-            from_timestamp = int((datetime.now(timezone.utc) - timedelta(days=7)).timestamp() * 1000)
-            to_timestamp = int(datetime.now(timezone.utc).timestamp() * 1000)
+            # Request only deals since the last known balance change (7 days on first call)
+            to_timestamp = _epoch_ms()
+            if self._last_balance_ts:
+                from_timestamp = self._last_balance_ts
+                max_rows = 20
+            else:
+                from_timestamp = to_timestamp - 7 * DAY_MS
+                max_rows = 100
 
-            payload = {
-                "ctidTraderAccountId": self.ctid_trader_account_id,
-                "fromTimestamp": from_timestamp,
-                "toTimestamp": to_timestamp,
-                "maxRows": 100
-            }
+            for _ in range(DEAL_LIST_MAX_PAGES):
+                payload = {
+                    "ctidTraderAccountId": self.ctid_trader_account_id,
+                    "fromTimestamp": from_timestamp,
+                    "toTimestamp": to_timestamp,
+                    "maxRows": max_rows
+                }
 
-            mid = await self._send(PT_DEAL_LIST_REQ, payload, expected_response_type=PT_DEAL_LIST_RES)
-            logger.info(f"[ACCOUNT] PT_DEAL_LIST_REQ sent with msgId={mid}, waiting for response...")
+                mid = await self._send(PT_DEAL_LIST_REQ, payload, expected_response_type=PT_DEAL_LIST_RES, track_response=True)
+                logger.info(f"[ACCOUNT] PT_DEAL_LIST_REQ sent with msgId={mid}, waiting for response...")
 
-            try:
-                response = await self._receive(PT_DEAL_LIST_RES, expect_id=mid)
-                logger.info(f"[ACCOUNT] PT_DEAL_LIST_RES received: {response is not None}")
-            except TimeoutError:
-                # Timeout is OK - response may arrive out-of-order and be handled by recv_loop
-                logger.warning(f"[ACCOUNT] Timeout waiting for PT_DEAL_LIST_RES (msgId={mid}) - response may arrive out-of-order")
-                logger.info(f"[ACCOUNT] Account snapshot will be updated when response arrives via recv_loop")
-                return  # Exit gracefully - recv_loop will handle the response
+                try:
+                    response = await self._receive(PT_DEAL_LIST_RES, expect_id=mid)
+                    logger.info(f"[ACCOUNT] PT_DEAL_LIST_RES received: {response is not None}")
+                except TimeoutError:
+                    # Timeout is OK - response may arrive out-of-order and be handled by recv_loop
+                    logger.warning(f"[ACCOUNT] Timeout waiting for PT_DEAL_LIST_RES (msgId={mid}) - late response goes to _handle_deal_list_response")
+                    logger.info(f"[ACCOUNT] Account snapshot will be updated when response arrives via recv_loop")
+                    return  # Exit gracefully - recv_loop will handle the response
+
+                if not (response and "payload" in response):
+                    break
 
-            if response and "payload" in response:
-                payload = response["payload"]
-                deals = payload.get("deal", [])
-                logger.info(f"[ACCOUNT] Received {len(deals)} deals from last 7 days")
+                deals = response["payload"].get("deal", [])
+                logger.info(f"[ACCOUNT] Received {len(deals)} deals since {from_timestamp}")
 
                 # Extract balance from deals (same logic as Account Monitor)
-                actual_balance = None
-                if deals:
-                    last_balance = 0
-                    last_version = 0
-
-                    for deal in deals:
-                        close_detail = deal.get("closePositionDetail", {})
-                        if close_detail:
-                            version = close_detail.get("balanceVersion", 0)
-                            balance_raw = close_detail.get("balance", 0)
-                            if version > last_version:
-                                last_version = version
-                                last_balance = balance_raw
-
-                    if last_balance > 0 and last_version > 0:
-                        actual_balance = last_balance / 100
-                        logger.info(f"[ACCOUNT] ✅ Balance from deals: {actual_balance:,.2f} CZK (v{last_version})")
-                    else:
-                        logger.warning(f"[ACCOUNT] ⚠️ No closed deals found, using config balance")
-                        actual_balance = self.account_balance
+                self._record_balance_deals(deals)
+
+                # More than maxRows deals in the window - continue after the newest deal of this page
+                if not response["payload"].get("hasMore"):
+                    break
+                newest_ts = max((d.get("executionTimestamp", 0) for d in deals), default=0)
+                if newest_ts <= from_timestamp:
+                    break  # No progress possible, keep what we have
+                from_timestamp = newest_ts
+            else:
+                logger.warning(f"[ACCOUNT] ⚠️ Deal list still has more rows after {DEAL_LIST_MAX_PAGES} pages")
+
+            if response and "payload" in response:
+                last_version = self._last_balance_version
+                last_balance = self._last_balance
+
+                if last_balance > 0 and last_version > 0:
+                    actual_balance = last_balance / 100
+                    logger.info(f"[ACCOUNT] ✅ Balance from deals: {actual_balance:,.2f} CZK (v{last_version})")
                 else:
-                    # No deals in response - use config balance
-                    logger.warning(f"[ACCOUNT] No deals in response, using config balance")
+                    logger.warning(f"[ACCOUNT] ⚠️ No closed deals found, using config balance")
                     actual_balance = self.account_balance
 
                 # Send callback with balance (from deals or config)
                 if actual_balance and actual_balance > 0:
-                    logger.info(f"[ACCOUNT] Sending callback with balance: {actual_balance:,.2f} {self.account_currency}")
-
-                    if self.on_account_callback:
-                        # Create trader object with balance in cents (multiply by 100 for moneyDigits=2)
-                        trader_data = {
-                            "ctidTraderAccountId": self.ctid_trader_account_id,
-                            "balance": int(actual_balance * 100),  # Convert to cents
-                            "equity": int(actual_balance * 100),   # Same as balance (no open positions)
-                            "margin": 0,
-                            "freeMargin": int(actual_balance * 100),
-                            "moneyDigits": 2,  # CRITICAL: Tell BalanceTracker to divide by 100
-                            "depositCurrency": self.account_currency
-                        }
-
-                        callback_data = {
-                            "balance": actual_balance,
-                            "equity": actual_balance,
-                            "margin_used": 0,
-                            "free_margin": actual_balance,
-                            "currency": self.account_currency,
-                            "positions": 0,
-                            "timestamp": datetime.now(timezone.utc),
-                            "trader": trader_data
-                        }
-                        self.on_account_callback(callback_data)
-                        logger.info(f"[ACCOUNT] ✅ Callback sent with balance: {actual_balance:,.2f} CZK")
+                    self._snapshot_cache = {'balance': actual_balance, 'ts': time.monotonic()}
+                    self._emit_snapshot_callback(actual_balance)
                 else:
                     logger.warning(f"[ACCOUNT] No valid balance available, will use config default")
 
@@ -1520,33 +1794,87 @@ class CTraderClient:
             logger.error(f"[ACCOUNT] Failed to get account snapshot: {e}")
 
 
+    def _record_balance_deals(self, deals: List[Dict]):
+        """Remember the newest closePositionDetail balance (by balanceVersion)"""
+        # Single C-level max() pass instead of a Python compare loop over all deals
+        latest = max(deals, key=_deal_balance_version, default=None)
+        if latest is None:
+            return
+        version = _deal_balance_version(latest)
+        if version <= self._last_balance_version:
+            return  # Nothing newer than what an earlier (overlapping) request gave us
+
+        self._last_balance = latest["closePositionDetail"].get("balance", 0)
+        self._last_balance_version = version
+        self._last_balance_ts = latest.get("executionTimestamp") or self._last_balance_ts
+
+    def _emit_snapshot_callback(self, actual_balance: float):
+        """Send snapshot balance to on_account_callback (fresh or cached)"""
+        logger.info(f"[ACCOUNT] Sending callback with balance: {actual_balance:,.2f} {self.account_currency}")
+
+        if self.on_account_callback:
+            # Create trader object with balance in cents (multiply by 100 for moneyDigits=2)
+            cents = int(actual_balance * 100)
+            trader_data = self._trader_data_template.copy()
+            trader_data["ctidTraderAccountId"] = self.ctid_trader_account_id
+            # Equity same as balance (no open positions)
+            trader_data["balance"] = trader_data["equity"] = trader_data["freeMargin"] = cents
+            trader_data["depositCurrency"] = self.account_currency
+
+            callback_data = self._build_account_data(actual_balance, trader=trader_data)
+            callback_data["positions"] = 0
+            self.on_account_callback(callback_data)
+            logger.info(f"[ACCOUNT] ✅ Callback sent with balance: {actual_balance:,.2f} CZK")
+
+    def _build_account_data(self, balance: float, margin_used: float = 0.0, trader: Optional[Dict] = None,
+                            source: Optional[str] = None) -> Dict:
+        """account_data dict for on_account_callback (balance in account currency)"""
+        data = {
+            "balance": balance,
+            "equity": balance,
+            "margin_used": margin_used,
+            "free_margin": balance - margin_used,
+            "currency": self.account_currency,
+            "timestamp": datetime.now(timezone.utc),
+        }
+        if trader is not None:
+            data["trader"] = trader
+        if source is not None:
+            data["source"] = source
+        return data
+
+    def _invalidate_snapshot(self, reason: str):
+        """Drop cached account snapshot so the next request hits the server"""
+        if self._snapshot_cache is not None:
+            self._snapshot_cache = None
+            logger.debug(f"[ACCOUNT] Snapshot cache invalidated ({reason})")
+
     def _handle_deal_list_response(self, msg: Dict):
         """Handle PT_DEAL_LIST_RES - daily deals for realized PnL"""
-        logger.debug(f"[💰 DEAL_LIST] ENTRY: _handle_deal_list_response called")
+        logger.debug("%s ENTRY: _handle_deal_list_response called", TAG_DEAL_LIST)
         try:
             payload = msg.get('payload', {})
             deals = payload.get('deal', [])
 
-            logger.info(f"[💰 DEAL_LIST] Received {len(deals)} deals")
+            logger.info("%s Received %d deals", TAG_DEAL_LIST, len(deals))
+            self._record_balance_deals(deals)
 
             # Call account monitor callbacks for deals data (daily PnL)
-            logger.debug(f"[💰 DEAL_LIST] Checking callbacks: count={len(self._account_callbacks)}")
+            logger.debug("%s Checking callbacks: count=%d", TAG_DEAL_LIST, len(self._account_callbacks))
             if self._account_callbacks:
                 deal_account_data = {
                     "deals": deals,
                     "timestamp": datetime.now(timezone.utc),
                     "source": "PT_DEAL_LIST_RES"
                 }
-                logger.debug(f"[💰 DEAL_LIST] About to notify {len(self._account_callbacks)} callbacks")
+                logger.debug("%s About to notify %d callbacks", TAG_DEAL_LIST, len(self._account_callbacks))
                 self._notify_account_callbacks(deal_account_data)
-                logger.debug(f"[💰 DEAL_LIST] Callbacks notified successfully")
+                logger.debug("%s Callbacks notified successfully", TAG_DEAL_LIST)
             else:
-                logger.debug(f"[💰 DEAL_LIST] No callbacks registered!")
+                logger.debug("%s No callbacks registered!", TAG_DEAL_LIST)
 
-        except Exception as e:
-            logger.error(f"[💰 DEAL_LIST] Error handling deal list: {e}")
-            import traceback
-            logger.error(f"[💰 DEAL_LIST] Traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("%s Error handling deal list", TAG_DEAL_LIST)
 
     # ------------------------------------------------------------
     # Account Monitoring Callback Registration
@@ -1555,7 +1883,7 @@ class CTraderClient:
     def add_account_callback(self, callback: Callable):
         """Add callback for account updates (for account monitor)"""
         if callback not in self._account_callbacks:
-            self._account_callbacks.append(callback)
+            self._account_callbacks[callback] = 0
             logger.info(f"[ACCOUNT] Registered callback for account updates")
         else:
             logger.info(f"[ACCOUNT_MONITOR] Callback already registered, skipping")
@@ -1563,13 +1891,14 @@ class CTraderClient:
     def add_price_callback(self, callback: Callable):
         """Add callback for price updates (for PnL calculation)"""
         if callback not in self._price_callbacks:
-            self._price_callbacks.append(callback)
+            self._price_callbacks[callback] = 0
+            self._has_price_cb = True
             logger.info(f"[ACCOUNT_MONITOR] Added price callback: {callback.__name__ if hasattr(callback, '__name__') else 'unknown'}")
 
     def add_execution_callback(self, callback: Callable):
         """Add callback for execution events (for realized PnL)"""
         if callback not in self._execution_callbacks:
-            self._execution_callbacks.append(callback)
+            self._execution_callbacks[callback] = 0
             callback_name = callback.__name__ if hasattr(callback, '__name__') else str(callback)
             logger.info(f"[ACCOUNT_MONITOR] Added execution callback: {callback_name}")
             logger.info(f"[ACCOUNT_MONITOR] Total execution callbacks now: {len(self._execution_callbacks)}")
@@ -1591,32 +1920,62 @@ class CTraderClient:
 
     def _notify_account_callbacks(self, account_data: Dict):
         """Notify all registered account callbacks"""
-        logger.debug(f"[💰 NOTIFY] ENTRY: Notifying {len(self._account_callbacks)} callbacks")
-        for i, callback in enumerate(self._account_callbacks):
+        # Formatting is deferred (%-style) and per-callback lines are skipped unless DEBUG is on
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("%s ENTRY: Notifying %d callbacks", TAG_NOTIFY, len(self._account_callbacks))
+        registry = self._account_callbacks
+        # Iterate a snapshot - callbacks may be (un)registered meanwhile, also from other threads
+        for i, (callback, failures) in enumerate(tuple(registry.items())):
             try:
-                logger.debug(f"[💰 NOTIFY] Calling callback #{i}: {callback}")
+                if debug:
+                    logger.debug("%s Calling callback #%d: %s", TAG_NOTIFY, i, callback)
                 callback(account_data)
-                logger.debug(f"[💰 NOTIFY] Callback #{i} completed successfully")
-            except Exception as e:
-                logger.error(f"[ACCOUNT_MONITOR] Error in account callback {callback}: {e}")
-                import traceback
-                logger.error(f"[ACCOUNT_MONITOR] Traceback: {traceback.format_exc()}")
+                if failures:
+                    registry[callback] = 0
+                if debug:
+                    logger.debug("%s Callback #%d completed successfully", TAG_NOTIFY, i)
+            except Exception:
+                logger.exception("[ACCOUNT_MONITOR] Error in account callback %s", callback)
+                self._record_callback_failure(registry, callback, "account")
 
     def _notify_price_callbacks(self, symbol_id: int, price_data: Dict):
-        """Notify all registered price callbacks"""
-        for callback in self._price_callbacks:
+        """Notify all registered price callbacks (per tick - keep the loop minimal)"""
+        registry = self._price_callbacks
+        if not registry:
+            return
+        for callback, failures in tuple(registry.items()):
             try:
                 callback(symbol_id, price_data)
             except Exception as e:
-                logger.error(f"[ACCOUNT_MONITOR] Error in price callback {callback}: {e}")
+                logger.error("[ACCOUNT_MONITOR] Error in price callback %s: %s", callback, e)
+                self._record_callback_failure(registry, callback, "price")
+                continue
+            if failures:
+                registry[callback] = 0
 
     def _notify_execution_callbacks(self, execution_data: Dict):
         """Notify all registered execution callbacks"""
-        for callback in self._execution_callbacks:
+        registry = self._execution_callbacks
+        for callback, failures in tuple(registry.items()):
             try:
                 callback(execution_data)
+                if failures:
+                    registry[callback] = 0
             except Exception as e:
-                logger.error(f"[ACCOUNT_MONITOR] Error in execution callback {callback}: {e}")
+                logger.error("[ACCOUNT_MONITOR] Error in execution callback %s: %s", callback, e)
+                self._record_callback_failure(registry, callback, "execution")
+
+    def _record_callback_failure(self, registry: Dict[Callable, int], callback: Callable, kind: str):
+        """Count a consecutive failure; drop the callback once it hits CALLBACK_MAX_FAILURES"""
+        failures = registry.get(callback, 0) + 1
+        if failures < CALLBACK_MAX_FAILURES:
+            registry[callback] = failures
+            return
+        registry.pop(callback, None)
+        if registry is self._price_callbacks:
+            self._has_price_cb = bool(registry)
+        logger.warning(f"[ACCOUNT_MONITOR] Unregistered {kind} callback {callback} after {failures} consecutive failures")
 
     async def _request_current_positions(self):
         """Request current open positions"""
@@ -1628,7 +1987,7 @@ class CTraderClient:
                 "ctidTraderAccountId": self.ctid_trader_account_id
             }
 
-            mid = await self._send(PT_TRADER_REQ, reconcile_payload)
+            mid = await self._send(PT_TRADER_REQ, reconcile_payload, track_response=True)
             logger.info(f"[POSITIONS] RECONCILE_REQ sent to get current positions, waiting for response...")
 
             # Wait for reconcile response
@@ -1643,23 +2002,12 @@ class CTraderClient:
                     logger.info(f"[ACCOUNT] Balance from reconcile: {balance_raw} (raw)")
 
                     # Convert with same logic as trader response
-                    if balance_raw > 1000000:  # If larger than 10k, likely in cents/hundredths
-                        self.account_balance = balance_raw / 100.0
-                        logger.info(f"[ACCOUNT] Converted reconcile balance from cents: {balance_raw} → {self.account_balance}")
-                    else:
-                        self.account_balance = balance_raw
-                        logger.info(f"[ACCOUNT] Using reconcile balance as-is: {self.account_balance}")
+                    self.account_balance = self._norm_money(balance_raw)
+                    logger.info(f"[ACCOUNT] Reconcile balance: {balance_raw} → {self.account_balance}")
 
                     # Update account callback with corrected balance
                     if self.on_account_callback:
-                        account_data = {
-                            "balance": self.account_balance,
-                            "equity": self.account_balance,
-                            "margin_used": self.account_margin_used,
-                            "free_margin": self.account_balance - self.account_margin_used,
-                            "currency": self.account_currency,
-                            "timestamp": datetime.now(timezone.utc)
-                        }
+                        account_data = self._build_account_data(self.account_balance, self.account_margin_used)
                         self.on_account_callback(account_data)
                         logger.info(f"[ACCOUNT] Updated balance from reconcile: {self.account_balance} {self.account_currency}")
 
@@ -1669,6 +2017,11 @@ class CTraderClient:
         except Exception as e:
             logger.error(f"[POSITIONS] Failed to request current positions: {e}")
 
+    @staticmethod
+    def _norm_money(raw) -> float:
+        """cTrader money value to account currency - values above 1M (i.e. >10k) are in cents"""
+        return raw / 100.0 if raw > 1_000_000 else float(raw)
+
     def _handle_account_event(self, msg):
         """Handle account-related events"""
         try:
@@ -1677,107 +2030,88 @@ class CTraderClient:
 
             logger.info(f"[ACCOUNT_EVENT] Called with payloadType={payload_type}, PT_TRADER_RES={PT_TRADER_RES}, payload keys={list(payload.keys())}")
 
-            if payload_type == PT_TRADER_RES:
-                # Account balance update
-                balance_raw = payload.get("balance", 0)
-                currency = payload.get("depositCurrency", "CZK")
-
-                logger.info(f"[ACCOUNT] Raw balance from trader event: {balance_raw}")
-
-                # Guard: Ignore zero/empty balance (PT_TRADER_RES sometimes doesn't include equity)
-                if not balance_raw:
-                    logger.debug("[ACCOUNT] Ignoring zero/empty balance from PT_TRADER_RES")
-                else:
-                    # Convert with same logic
-                    if balance_raw > 1000000:  # If larger than 10k, likely in cents/hundredths
-                        self.account_balance = balance_raw / 100.0
-                        logger.info(f"[ACCOUNT] Converted event balance from cents: {balance_raw} → {self.account_balance}")
-                    else:
-                        self.account_balance = balance_raw
-                        logger.info(f"[ACCOUNT] Using event balance as-is: {self.account_balance}")
-
-                    self.account_currency = currency
-                    logger.info(f"[ACCOUNT] Balance updated from event: {self.account_balance} {self.account_currency}")
-
-            elif payload_type == PT_POSITION_STATUS_EVENT:
-                # Position updates for margin calculation
-                logger.info(f"[ACCOUNT] Position status event: {payload}")
-
-            elif payload_type == PT_EXECUTION_EVENT:
-                # Extract margin info from execution events
-                used_margin_raw = payload.get("usedMargin", 0)
-                if used_margin_raw > 0:
-                    # Convert margin from cents to base currency
-                    if used_margin_raw > 1000000:  # Likely in cents
-                        used_margin = used_margin_raw / 100.0
-                        logger.info(f"[ACCOUNT] Converted used margin from cents: {used_margin_raw} → {used_margin}")
-                    else:
-                        used_margin = used_margin_raw
-                        logger.info(f"[ACCOUNT] Using used margin as-is: {used_margin}")
-
-                    self.account_margin_used = used_margin
-
-                # IMPORTANT: Do NOT call on_account_callback for execution events
-                # Execution events don't have trader balance data, only position info
-                # Balance tracker should only update from PT_TRADER_RES with proper trader object
-                logger.info(f"[ACCOUNT] Updated margin from execution event, skipping balance callback")
-                return  # Exit early to avoid calling on_account_callback with execution event data
-
-            # PT_RECONCILE_RES removed - using only PT_TRADER_RES in JSON protocol
-                # Handle reconcile response for balance updates
-                balance_raw = payload.get("balance", 0)
-                if balance_raw > 0:
-                    logger.info(f"[ACCOUNT] Raw balance from reconcile event: {balance_raw}")
-
-                    if balance_raw > 1000000:  # Likely in cents
-                        self.account_balance = balance_raw / 100.0
-                        logger.info(f"[ACCOUNT] Converted reconcile event balance: {balance_raw} → {self.account_balance}")
-                    else:
-                        self.account_balance = balance_raw
-
-            # Call account callback with updated data
+            handler = self._account_event_dispatch.get(payload_type)
+            if handler is None:
+                return
+            # Handlers return True when account callbacks should get the updated state
             # ONLY for PT_TRADER_RES or PT_POSITION_STATUS_EVENT, NOT for PT_EXECUTION_EVENT
-
-            # CRITICAL FIX: Demo accounts don't return balance in PT_TRADER_RES, but DO return positions
-            # Always notify Account Monitor if we have position data, even if balance=0
-            has_positions = 'position' in payload and payload.get('position')
-
-            if self.account_balance > 0 or has_positions:
-                account_data = {
-                    "balance": self.account_balance,
-                    "equity": self.account_balance,
-                    "margin_used": self.account_margin_used,
-                    "free_margin": self.account_balance - self.account_margin_used,
-                    "currency": self.account_currency,
-                    "timestamp": datetime.now(timezone.utc),
-                    "trader": payload  # CRITICAL: Include trader payload for BalanceTracker (only from PT_TRADER_RES)
-                }
-
-                # Call legacy callback (only if balance > 0)
-                if self.on_account_callback and self.account_balance > 0:
-                    self.on_account_callback(account_data)
-                    logger.info(f"[ACCOUNT] ✅ Called on_account_callback for payload_type={payload_type}")
-
-                # CRITICAL: Always notify Account Monitor with PT_TRADER_RES position data (even if balance=0)
-                trader_account_data = {
-                    "trader": {
-                        "balance": int(self.account_balance * 100),  # Convert back to cents
-                        "equity": int(self.account_balance * 100),
-                        "margin": int(self.account_margin_used * 100),
-                        "freeMargin": int((self.account_balance - self.account_margin_used) * 100),
-                        "depositCurrency": self.account_currency
-                    },
-                    "position": payload.get('position', []),  # Include positions from PT_TRADER_RES
-                    "deals": [],
-                    "timestamp": datetime.now(timezone.utc),
-                    "source": "PT_TRADER_RES"
-                }
-                logger.info(f"[ACCOUNT] 📍 Notifying AccountMonitor with PT_TRADER_RES: {len(payload.get('position', []))} positions")
-                self._notify_account_callbacks(trader_account_data)
+            if handler(payload):
+                self._notify_account_state(payload_type, payload)
 
         except Exception as e:
             logger.error(f"[ACCOUNT] Error handling account event: {e}")
 
+    def _on_trader_res(self, payload: Dict) -> bool:
+        """PT_TRADER_RES - account balance update"""
+        balance_raw = payload.get("balance", 0)
+        currency = payload.get("depositCurrency", "CZK")
+
+        logger.info(f"[ACCOUNT] Raw balance from trader event: {balance_raw}")
+
+        # Guard: Ignore zero/empty balance (PT_TRADER_RES sometimes doesn't include equity)
+        if not balance_raw:
+            logger.debug("[ACCOUNT] Ignoring zero/empty balance from PT_TRADER_RES")
+        else:
+            self._invalidate_snapshot("PT_TRADER_RES balance")
+            # Convert with same logic
+            self.account_balance = self._norm_money(balance_raw)
+            self.account_currency = currency
+            logger.info(f"[ACCOUNT] Balance updated from event: {self.account_balance} {self.account_currency}")
+        return True
+
+    def _on_position_status(self, payload: Dict) -> bool:
+        """PT_POSITION_STATUS_EVENT - position updates for margin calculation"""
+        logger.info(f"[ACCOUNT] Position status event: {payload}")
+        return True
+
+    def _on_execution_margin(self, payload: Dict) -> bool:
+        """PT_EXECUTION_EVENT - extract margin info, never notifies balance callbacks"""
+        used_margin_raw = payload.get("usedMargin", 0)
+        if used_margin_raw > 0:
+            # Convert margin from cents to base currency
+            self.account_margin_used = self._norm_money(used_margin_raw)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"[ACCOUNT] Used margin: {used_margin_raw} → {self.account_margin_used}")
+
+        # IMPORTANT: Do NOT call on_account_callback for execution events
+        # Execution events don't have trader balance data, only position info
+        # Balance tracker should only update from PT_TRADER_RES with proper trader object
+        logger.info(f"[ACCOUNT] Updated margin from execution event, skipping balance callback")
+        return False
+
+    def _notify_account_state(self, payload_type: int, payload: Dict):
+        """Push current balance/margin (and PT_TRADER_RES positions) to account callbacks"""
+        # CRITICAL FIX: Demo accounts don't return balance in PT_TRADER_RES, but DO return positions
+        # Always notify Account Monitor if we have position data, even if balance=0
+        has_positions = 'position' in payload and payload.get('position')
+
+        if self.account_balance > 0 or has_positions:
+            # CRITICAL: Include trader payload for BalanceTracker (only from PT_TRADER_RES)
+            account_data = self._build_account_data(self.account_balance, self.account_margin_used, trader=payload)
+            now = account_data["timestamp"]
+
+            # Call legacy callback (only if balance > 0)
+            if self.on_account_callback and self.account_balance > 0:
+                self.on_account_callback(account_data)
+                logger.info(f"[ACCOUNT] ✅ Called on_account_callback for payload_type={payload_type}")
+
+            # CRITICAL: Always notify Account Monitor with PT_TRADER_RES position data (even if balance=0)
+            trader = self._trader_data_template.copy()
+            trader["ctidTraderAccountId"] = self.ctid_trader_account_id
+            trader["balance"] = trader["equity"] = int(self.account_balance * 100)  # Convert back to cents
+            trader["margin"] = int(self.account_margin_used * 100)
+            trader["freeMargin"] = int((self.account_balance - self.account_margin_used) * 100)
+            trader["depositCurrency"] = self.account_currency
+            trader_account_data = {
+                "trader": trader,
+                "position": payload.get('position', []),  # Include positions from PT_TRADER_RES
+                "deals": [],
+                "timestamp": now,
+                "source": "PT_TRADER_RES"
+            }
+            logger.info(f"[ACCOUNT] 📍 Notifying AccountMonitor with PT_TRADER_RES: {len(payload.get('position', []))} positions")
+            self._notify_account_callbacks(trader_account_data)
+
     # ------------------------------------------------------------
     # THREAD-SAFE COMMAND QUEUE for Cross-Thread Operations
     # ------------------------------------------------------------
@@ -1785,7 +2119,6 @@ class CTraderClient:
     async def _start_command_processor(self):
         """Initialize and start command queue processor"""
         try:
-            import asyncio
             self._command_queue = asyncio.Queue()
             self._command_processor_task = asyncio.create_task(self._process_commands())
             logger.info("[COMMAND_QUEUE] ✅ Command processor started")
@@ -1799,37 +2132,164 @@ class CTraderClient:
                 try:
                     # Wait for commands with timeout to allow clean shutdown
                     cmd = await asyncio.wait_for(self._command_queue.get(), timeout=1.0)
-
-                    logger.info(f"[COMMAND_QUEUE] Processing command: {cmd['type']}")
-
-                    if cmd['type'] == 'send_order':
-                        await self._send_order_internal(cmd['payload'], cmd.get('callback'))
-                    elif cmd['type'] == 'request_deals':
-                        await self._request_deals_internal(cmd['payload'], cmd.get('callback'))
-                    elif cmd['type'] == 'cancel_order':
-                        await self._cancel_order_internal(cmd['payload'], cmd.get('callback'))
-                    else:
-                        logger.warning(f"[COMMAND_QUEUE] Unknown command type: {cmd['type']}")
-
-                    # Mark task as done
-                    self._command_queue.task_done()
-
                 except asyncio.TimeoutError:
                     # Normal timeout, continue loop
                     continue
+
+                # Drain everything else already queued - one await per burst, not per command
+                batch = [cmd]
+                while True:
+                    try:
+                        batch.append(self._command_queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+
+                try:
+                    await self._run_command_batch(batch)
                 except Exception as e:
                     logger.error(f"[COMMAND_QUEUE] Error processing command: {e}")
+                finally:
+                    # Mark tasks as done
+                    for _ in batch:
+                        self._command_queue.task_done()
 
         except Exception as e:
             logger.error(f"[COMMAND_QUEUE] Command processor error: {e}")
 
+    async def _run_command_batch(self, batch: List[Dict]):
+        """Run drained commands in order; consecutive request_deals are merged by range"""
+        deals_run: List[Dict] = []
+
+        for cmd in batch:
+            logger.info(f"[COMMAND_QUEUE] Processing command: {cmd['type']}")
+            if cmd['type'] == 'request_deals':
+                deals_run.append(cmd)
+                continue
+            # Deal requests queued before this command go out first - queue order is kept
+            if deals_run:
+                await self._run_deals_commands(deals_run)
+                deals_run = []
+            try:
+                if cmd['type'] == 'send_order':
+                    await self._send_order_internal(cmd['payload'], cmd.get('callback'))
+                elif cmd['type'] == 'cancel_order':
+                    await self._cancel_order_internal(cmd['payload'], cmd.get('callback'))
+                else:
+                    logger.warning(f"[COMMAND_QUEUE] Unknown command type: {cmd['type']}")
+            except Exception as e:
+                logger.error(f"[COMMAND_QUEUE] Error processing command: {e}")
+
+        if deals_run:
+            await self._run_deals_commands(deals_run)
+
+    async def _run_deals_commands(self, deals_cmds: List[Dict]):
+        """Run consecutive request_deals commands, errors logged like any other command"""
+        try:
+            await self._request_deals_merged(deals_cmds)
+        except Exception as e:
+            logger.error(f"[COMMAND_QUEUE] Error processing command: {e}")
+
+    async def _request_deals_merged(self, deals_cmds: List[Dict]):
+        """
+        Serve consecutive request_deals commands, one paged request per group of
+        overlapping (or touching) ranges.
+
+        A command alone in its group is sent as before (callback data = msgId).
+        Merged commands share one request, so their callbacks get the deals
+        instead: {'deal': [...]} filtered to their own [from, to] by executionTimestamp.
+        """
+        if len(deals_cmds) == 1:
+            await self._request_deals_internal(deals_cmds[0]['payload'], deals_cmds[0].get('callback'))
+            return
+
+        # Resolve request_deals_list defaults (today 00:00 / now) so ranges can be compared
+        now_ms = _epoch_ms()
+        day_start = now_ms - now_ms % DAY_MS
+        ranges = []
+        for cmd in deals_cmds:
+            payload = cmd['payload']
+            from_ts = payload.get('from_timestamp')
+            to_ts = payload.get('to_timestamp')
+            ranges.append((day_start if from_ts is None else from_ts,
+                           now_ms if to_ts is None else to_ts,
+                           payload.get('max_rows', 100),
+                           cmd.get('callback')))
+        ranges.sort(key=lambda r: r[0])
+
+        # [from, to, max_rows (summed), members]
+        groups: List[List] = []
+        for rng in ranges:
+            group = groups[-1] if groups else None
+            if group is not None and rng[0] <= group[1] + 1:
+                group[1] = max(group[1], rng[1])
+                group[2] += rng[2]
+                group[3].append(rng)
+            else:
+                groups.append([rng[0], rng[1], rng[2], [rng]])
+
+        for from_ts, to_ts, max_rows, members in groups:
+            if len(members) == 1:
+                await self._request_deals_internal(
+                    {'from_timestamp': from_ts, 'to_timestamp': to_ts, 'max_rows': max_rows}, members[0][3])
+                continue
+
+            logger.info(f"[DEALS] Merging {len(members)} queued deal requests into one: {from_ts}-{to_ts}, max_rows={max_rows}")
+            try:
+                deals = await self._request_deals_paged(from_ts, to_ts, max_rows)
+            except Exception as e:
+                logger.error(f"[DEALS] Error requesting merged deals: {e}")
+                for _, _, _, callback in members:
+                    if callback:
+                        callback({'success': False, 'error': str(e)})
+                continue
+
+            for member_from, member_to, _, callback in members:
+                if not callback:
+                    continue
+                own = [d for d in deals if member_from <= d.get('executionTimestamp', 0) <= member_to]
+                try:
+                    callback({'success': True, 'data': {'deal': own}})
+                except Exception as e:
+                    logger.error(f"[COMMAND_QUEUE] Command callback failed: {e}")
+
+    async def _request_deals_paged(self, from_timestamp: int, to_timestamp: int, max_rows: int) -> List[Dict]:
+        """Awaited PT_DEAL_LIST_REQ for [from, to], following hasMore like _get_account_snapshot"""
+        deals: Dict[Any, Dict] = {}  # dealId -> deal (consecutive pages overlap by one timestamp)
+        for _ in range(DEAL_LIST_MAX_PAGES):
+            payload = {
+                "ctidTraderAccountId": self.ctid_trader_account_id,
+                "fromTimestamp": from_timestamp,
+                "toTimestamp": to_timestamp,
+                "maxRows": max_rows
+            }
+            mid = await self._send(PT_DEAL_LIST_REQ, payload, expected_response_type=PT_DEAL_LIST_RES, track_response=True)
+            response = await self._receive(PT_DEAL_LIST_RES, expect_id=mid)
+
+            # Awaited responses bypass the recv_loop router - keep its balance/PnL handling
+            self._handle_deal_list_response(response)
+
+            page = response.get("payload", {})
+            page_deals = page.get("deal", [])
+            for deal in page_deals:
+                deals.setdefault(deal.get("dealId", id(deal)), deal)
+
+            if not page.get("hasMore"):
+                break
+            newest_ts = max((d.get("executionTimestamp", 0) for d in page_deals), default=0)
+            if newest_ts <= from_timestamp:
+                break  # No progress possible, keep what we have
+            from_timestamp = newest_ts
+        else:
+            logger.warning(f"[DEALS] ⚠️ Deal list still has more rows after {DEAL_LIST_MAX_PAGES} pages")
+
+        return list(deals.values())
+
     def send_order_from_thread(self, order_data: dict, callback=None):
         """Thread-safe order sending - Call from any thread"""
         if not self._command_queue:
             logger.error("[COMMAND_QUEUE] Command queue not initialized")
             return
 
-        import asyncio
         try:
             asyncio.run_coroutine_threadsafe(
                 self._command_queue.put({
@@ -7,13 +7,89 @@ MVP Implementation - Sprint 3
 """
 
 import logging
-from datetime import datetime, date, timedelta
-from typing import Dict, Any, List, Optional
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, date, time as dtime, timedelta
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional, Tuple, TypedDict
 import json
 from zoneinfo import ZoneInfo
 
 logger = logging.getLogger(__name__)
 
+# Trading day boundary timezone
+_PRAGUE = ZoneInfo("Europe/Prague")
+
+# Assumed full-size trades per daily limit (per-trade risk = daily limit / 3)
+_TRADES_PER_DAILY_LIMIT = 3.0
+
+# Summary indicator by usage bucket: <50%, 50-80%, 80%+
+_INDICATORS = ("🟢", "🟡", "🔴")
+
+# History entry for a day without saved data (date and trades filled per use)
+_EMPTY_DAY = {
+    'date': None,
+    'risk_used': 0.0,
+    'risk_limit': 0.0,
+    'risk_percentage_used': 0.0,
+    'trades_count': 0,
+    'trades': None
+}
+
+# Max seconds between full date checks (bounds wall-clock vs monotonic drift)
+_DATE_RECHECK_S = 60.0
+
+
+class TradePayload(TypedDict, total=False):
+    """Vstup add_trade - risk_amount je povinný, ostatní mají default"""
+    symbol: str
+    position_size: float
+    risk_amount: float
+    entry_price: float
+    sl_price: float
+    tp_price: float
+    trade_id: str
+
+
+@dataclass(slots=True)
+class TradeRecord:
+    """Jeden obchod v denním trackingu (slots - bez per-instance __dict__)"""
+    timestamp: float  # epoch, formatted only on output (see _export_trade)
+    symbol: str
+    position_size: float
+    entry_price: float
+    sl_price: float
+    tp_price: float
+    risk_amount: float
+    trade_id: str
+
+
+def _compute_permission(proposed_risk: float, risk_used: float,
+                        daily_limit: float, soft_cap_limit: float) -> Tuple[float, float, bool, bool]:
+    """
+    Čistá numerika pro can_trade (bez dictů a logování).
+
+    Předpokládá risk_used < soft_cap_limit (blokaci soft capu řeší volající).
+
+    Returns:
+        (scaled_risk, scale_factor, would_exceed, can_trade)
+    """
+    risk_after = risk_used + proposed_risk
+    would_exceed = risk_after > daily_limit
+    remaining = daily_limit - risk_used
+    if risk_after > soft_cap_limit:
+        # Scale down to fit soft cap budget
+        remaining_soft = soft_cap_limit - risk_used
+        return (remaining_soft, remaining_soft / proposed_risk, would_exceed,
+                not (would_exceed and remaining <= 0))
+    if would_exceed:
+        if remaining > 0:
+            # Scale down to fit hard limit budget
+            return remaining, remaining / proposed_risk, True, True
+        return proposed_risk, 1.0, True, False
+    return proposed_risk, 1.0, False, True
+
 
 class DailyRiskTracker:
     """
@@ -52,12 +128,29 @@ class DailyRiskTracker:
         
         # Daily tracking
         self.current_date: Optional[date] = None
+        self._date_valid_until: float = 0.0  # time.monotonic() until which current_date is still today
         self.daily_risk_used: float = 0.0  # CZK amount used today
-        self.daily_trades: List[Dict] = []
+        self.daily_trades: List[TradeRecord] = []
+        # Running per-symbol aggregates for today, maintained by add_trade
+        self._symbol_stats: Dict[str, Dict[str, Any]] = {}
+        
+        # Cached get_daily_status view and the inputs it was built from
+        self._status_key: Optional[tuple] = None
+        self._status_view: Optional[Mapping[str, Any]] = None
         
         # Historical data
-        self.daily_history: Dict[str, Dict] = {}  # date_str -> daily_data
+        # Ring buffer indexed by date ordinal % size - same day overwrites its slot,
+        # older days fall out as newer dates reuse the slot
         self.max_history_days = 30
+        self._history_ring: List[Optional[Dict]] = [None] * self.max_history_days
+        self._history_ord: List[int] = [0] * self.max_history_days  # date ordinal held by each slot
+        
+        # Optional JSONL persistence - one appended line per added trade, last line per date
+        # wins; the file is rewritten to one line per ring day on load and at rollover
+        self.history_path: Optional[str] = self.config.get('daily_risk_history_path')
+        if self.history_path:
+            self._load_history()
+            self._restore_today()
         
         logger.info(f"[DAILY_RISK] Initialized with {daily_limit_percentage:.1%} daily limit")
         if self.daily_loss_soft_cap:
@@ -65,7 +158,12 @@ class DailyRiskTracker:
     
     def _ensure_current_date(self):
         """Ensure we're tracking the current date, reset if new day"""
-        today = datetime.now(ZoneInfo("Europe/Prague")).date()
+        mono = time.monotonic()
+        if mono < self._date_valid_until:
+            return
+        
+        now = datetime.now(_PRAGUE)
+        today = now.date()
         
         if self.current_date != today:
             # New day - save previous day and reset
@@ -73,48 +171,165 @@ class DailyRiskTracker:
                 self._save_daily_data()
             
             self._reset_daily_tracking(today)
+        
+        # Skip the tz conversion until next midnight (re-check at least every minute)
+        next_midnight = datetime.combine(today + timedelta(days=1), dtime.min, tzinfo=_PRAGUE)
+        self._date_valid_until = mono + min(next_midnight.timestamp() - now.timestamp(), _DATE_RECHECK_S)
     
     def _reset_daily_tracking(self, new_date: date):
         """Reset daily tracking for new date"""
         self.current_date = new_date
+        self._date_valid_until = 0.0  # Manual resets may set a date other than today
         self.daily_risk_used = 0.0
         self.daily_trades = []
+        self._symbol_stats = {}
         
         logger.info(f"[DAILY_RISK] Reset for new trading day: {new_date}")
     
+    def _current_day(self) -> Dict:
+        """History entry for the tracked day (trades list is the live one, not a copy)"""
+        daily_limit = self._get_daily_limit()
+        return {
+            'date': self.current_date.isoformat(),
+            'risk_used': self.daily_risk_used,
+            'risk_limit': daily_limit,
+            'risk_percentage_used': self.daily_risk_used / daily_limit if daily_limit > 0 else 0,
+            'trades_count': len(self.daily_trades),
+            'trades': self.daily_trades
+        }
+    
     def _save_daily_data(self):
         """Save current daily data to history"""
         if self.current_date is None:
             return
             
-        date_str = self.current_date.isoformat()
+        # No copy: callers reset right after saving (_reset_daily_tracking assigns a new
+        # list), so history takes ownership. Treat historical trade lists as immutable.
+        day = self._current_day()
+        self._store_history_day(self.current_date.toordinal(), day)
+        self._rewrite_history()
         
-        self.daily_history[date_str] = {
-            'date': date_str,
-            'risk_used': self.daily_risk_used,
-            'risk_limit': self._get_daily_limit(),
-            'risk_percentage_used': self.daily_risk_used / self._get_daily_limit() if self._get_daily_limit() > 0 else 0,
-            'trades_count': len(self.daily_trades),
-            'trades': self.daily_trades.copy()
-        }
+        logger.info(f"[DAILY_RISK] Saved daily data for {day['date']}: "
+                   f"{self.daily_risk_used:,.0f} CZK, {len(self.daily_trades)} trades")
+    
+    def _store_history_day(self, day_ord: int, day: Dict):
+        """Put day into its ring slot (overwrites older date in the same slot)"""
+        slot = day_ord % len(self._history_ring)
+        self._history_ord[slot] = day_ord
+        self._history_ring[slot] = day
+    
+    @staticmethod
+    def _history_line(day: Dict) -> str:
+        """Day as one JSON line (epoch timestamps)"""
+        fields = TradeRecord.__slots__
+        return json.dumps({
+            **day,
+            'trades': [{name: getattr(t, name) for name in fields} for t in day['trades']]
+        })
+    
+    def _ensure_history_dir(self):
+        """Create the history file's directory (write path only)"""
+        directory = os.path.dirname(self.history_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    def _append_history(self, day: Dict):
+        """Append day to history file as one JSON line"""
+        if not self.history_path:
+            return
+        try:
+            self._ensure_history_dir()
+            with open(self.history_path, 'a') as f:
+                f.write(self._history_line(day) + '\n')
+        except Exception as e:
+            logger.error(f"[DAILY_RISK] Failed to persist history to {self.history_path}: {e}")
+    
+    def _rewrite_history(self):
+        """Rewrite history file to one line per day in the ring (drops superseded and expired lines)"""
+        if not self.history_path:
+            return
+        days = sorted((entry for entry in zip(self._history_ord, self._history_ring) if entry[1] is not None),
+                      key=lambda entry: entry[0])
+        tmp_path = self.history_path + '.tmp'
+        try:
+            self._ensure_history_dir()
+            with open(tmp_path, 'w') as f:
+                for _, day in days:
+                    f.write(self._history_line(day) + '\n')
+            os.replace(tmp_path, self.history_path)  # atomic - a crash leaves the old file
+        except Exception as e:
+            logger.error(f"[DAILY_RISK] Failed to rewrite history {self.history_path}: {e}")
+    
+    def _load_history(self):
+        """Load persisted history into the ring (file order = save order)"""
+        loaded = skipped = 0
+        try:
+            with open(self.history_path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        day = json.loads(line)
+                        day['trades'] = [TradeRecord(**t) for t in day['trades']]
+                        self._store_history_day(date.fromisoformat(day['date']).toordinal(), day)
+                        loaded += 1
+                    except (ValueError, KeyError, TypeError):
+                        # e.g. truncated last line after a crash
+                        skipped += 1
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error(f"[DAILY_RISK] Failed to load history from {self.history_path}: {e}")
+            return
+        logger.info(f"[DAILY_RISK] Loaded {loaded} history entries from {self.history_path}"
+                   + (f" ({skipped} invalid lines skipped)" if skipped else ""))
+        
+        # Per-trade lines and days older than the ring only slow down the next load
+        kept = sum(day is not None for day in self._history_ring)
+        if loaded + skipped > kept:
+            self._rewrite_history()
+    
+    def _restore_today(self):
+        """Resume today's trades from loaded history (restart during the trading day)"""
+        today = datetime.now(_PRAGUE).date()
+        day_ord = today.toordinal()
+        day = self._history_lookup(day_ord)
+        if day is None:
+            return
         
-        # Limit history size
-        if len(self.daily_history) > self.max_history_days:
-            # Keep only recent days
-            sorted_dates = sorted(self.daily_history.keys())
-            for old_date in sorted_dates[:-self.max_history_days]:
-                del self.daily_history[old_date]
+        # Today lives in daily_* until rollover saves it - not in the history ring
+        slot = day_ord % len(self._history_ring)
+        self._history_ord[slot] = 0
+        self._history_ring[slot] = None
         
-        logger.info(f"[DAILY_RISK] Saved daily data for {date_str}: "
-                   f"{self.daily_risk_used:,.0f} CZK, {len(self.daily_trades)} trades")
+        self._reset_daily_tracking(today)
+        for trade in day['trades']:
+            self._track_trade(trade)
+        
+        logger.info(f"[DAILY_RISK] Restored today's {len(self.daily_trades)} trades, "
+                   f"risk used {self.daily_risk_used:,.0f} CZK")
     
-    def _get_daily_limit(self) -> float:
-        """Get daily risk limit in CZK"""
+    def _get_balance(self) -> float:
+        """Get current balance in CZK (0 without balance tracker)"""
         if self.balance_tracker is None:
             return 0
             
-        current_balance = self.balance_tracker.get_current_balance()
-        return current_balance * self.daily_limit_percentage
+        return self.balance_tracker.get_current_balance()
+    
+    def _get_daily_limit(self) -> float:
+        """Get daily risk limit in CZK"""
+        return self._get_balance() * self.daily_limit_percentage
+    
+    def _snapshot(self) -> Tuple[float, float]:
+        """
+        Date check + one balance read for the public methods
+        
+        Returns:
+            (daily_limit, soft_cap_limit) in CZK
+        """
+        self._ensure_current_date()
+        balance = self._get_balance()
+        return balance * self.daily_limit_percentage, balance * self.daily_loss_soft_cap
     
     def can_trade(self, proposed_risk: float) -> Dict[str, Any]:
         """
@@ -126,18 +341,14 @@ class DailyRiskTracker:
         Returns:
             Dict with trade permission and details
         """
-        self._ensure_current_date()
-        
-        daily_limit = self._get_daily_limit()
-        daily_loss_soft_cap_limit = self._get_soft_cap_limit()
+        daily_limit, daily_loss_soft_cap_limit = self._snapshot()
+        inv_limit = 1.0 / daily_limit if daily_limit > 0 else 0.0
         risk_after_trade = self.daily_risk_used + proposed_risk
-        would_exceed = risk_after_trade > daily_limit
         would_exceed_soft_cap = risk_after_trade > daily_loss_soft_cap_limit
         
         remaining_risk = max(0, daily_limit - self.daily_risk_used)
-        remaining_risk_soft_cap = max(0, daily_loss_soft_cap_limit - self.daily_risk_used)
-        risk_percentage_used = self.daily_risk_used / daily_limit if daily_limit > 0 else 0
-        risk_percentage_after = risk_after_trade / daily_limit if daily_limit > 0 else 0
+        risk_percentage_used = self.daily_risk_used * inv_limit
+        risk_percentage_after = risk_after_trade * inv_limit
         
         # PHASE 2: Soft cap check - block new entries if soft cap reached
         if self.daily_risk_used >= daily_loss_soft_cap_limit:
@@ -163,25 +374,19 @@ class DailyRiskTracker:
                           f"{self.daily_risk_used:,.0f} >= {daily_loss_soft_cap_limit:,.0f} CZK")
             return result
         
-        # Soft-cap scaling: if would exceed, suggest scaled down risk
-        scaled_risk = proposed_risk
-        scale_factor = 1.0
+        scaled_risk, scale_factor, would_exceed, allowed = _compute_permission(
+            proposed_risk, self.daily_risk_used, daily_limit, daily_loss_soft_cap_limit)
 
-        if would_exceed_soft_cap and remaining_risk_soft_cap > 0:
-            # Scale down to fit soft cap budget
-            scale_factor = remaining_risk_soft_cap / proposed_risk
-            scaled_risk = remaining_risk_soft_cap
-            logger.info(f"[DAILY_RISK] Soft-cap scaling: {proposed_risk:,.0f} → {scaled_risk:,.0f} CZK "
-                       f"(scale factor: {scale_factor:.2f}, approaching soft cap)")
-        elif would_exceed and remaining_risk > 0:
-            # Scale down to fit hard limit budget
-            scale_factor = remaining_risk / proposed_risk
-            scaled_risk = remaining_risk
-            logger.info(f"[DAILY_RISK] Hard limit scaling: {proposed_risk:,.0f} → {scaled_risk:,.0f} CZK "
-                       f"(scale factor: {scale_factor:.2f})")
+        if scale_factor < 1.0 and logger.isEnabledFor(logging.INFO):
+            if would_exceed_soft_cap:
+                logger.info(f"[DAILY_RISK] Soft-cap scaling: {proposed_risk:,.0f} → {scaled_risk:,.0f} CZK "
+                           f"(scale factor: {scale_factor:.2f}, approaching soft cap)")
+            else:
+                logger.info(f"[DAILY_RISK] Hard limit scaling: {proposed_risk:,.0f} → {scaled_risk:,.0f} CZK "
+                           f"(scale factor: {scale_factor:.2f})")
 
         result = {
-            'can_trade': True,  # Always allow trading with soft-cap (unless soft cap reached)
+            'can_trade': allowed,  # Always allow trading with soft-cap (unless limit exhausted)
             'proposed_risk': proposed_risk,
             'scaled_risk': scaled_risk,
             'scale_factor': scale_factor,
@@ -191,18 +396,17 @@ class DailyRiskTracker:
             'risk_remaining': remaining_risk,
             'risk_after_trade': self.daily_risk_used + scaled_risk,
             'percentage_used': risk_percentage_used,
-            'percentage_after': (self.daily_risk_used + scaled_risk) / daily_limit if daily_limit > 0 else 0,
+            'percentage_after': (self.daily_risk_used + scaled_risk) * inv_limit,
             'trades_count': len(self.daily_trades),
             'would_exceed': would_exceed,
             'soft_cap_reached': False,
             'scaled': scale_factor < 1.0
         }
 
-        if would_exceed and remaining_risk <= 0:
-            result['can_trade'] = False
+        if not allowed:
             logger.warning(f"[DAILY_RISK] Trade rejected - daily limit exhausted: "
                           f"{self.daily_risk_used:,.0f} >= {daily_limit:,.0f} CZK")
-        else:
+        elif logger.isEnabledFor(logging.DEBUG):
             logger.debug(f"[DAILY_RISK] Trade allowed: {proposed_risk:,.0f} CZK "
                         f"({remaining_risk:,.0f} remaining, soft cap: {daily_loss_soft_cap_limit:,.0f} CZK)")
         
@@ -210,71 +414,102 @@ class DailyRiskTracker:
     
     def _get_soft_cap_limit(self) -> float:
         """Get daily loss soft cap limit in CZK"""
-        if self.balance_tracker is None:
-            return 0
-            
-        current_balance = self.balance_tracker.get_current_balance()
-        return current_balance * self.daily_loss_soft_cap
+        return self._get_balance() * self.daily_loss_soft_cap
     
-    def add_trade(self, trade_data: Dict[str, Any]) -> bool:
+    def add_trade(self, trade_data: TradePayload) -> bool:
         """
         Add completed trade to daily tracking
         
         Args:
-            trade_data: Trade information dict
+            trade_data: Trade information dict (see TradePayload)
             
         Returns:
-            True if trade was added successfully
+            True if trade was added, False if payload is invalid
         """
+        # Validate at the boundary - a missing/non-numeric risk must not count as 0
         try:
-            self._ensure_current_date()
-            
-            # Extract trade information
-            symbol = trade_data.get('symbol', 'UNKNOWN')
-            position_size = trade_data.get('position_size', 0)
-            risk_amount = trade_data.get('risk_amount', 0)
-            entry_price = trade_data.get('entry_price', 0)
-            sl_price = trade_data.get('sl_price', 0)
-            tp_price = trade_data.get('tp_price', 0)
-            
-            # Create trade record
-            trade_record = {
-                'timestamp': datetime.now().isoformat(),
-                'symbol': symbol,
-                'position_size': position_size,
-                'entry_price': entry_price,
-                'sl_price': sl_price,
-                'tp_price': tp_price,
-                'risk_amount': risk_amount,
-                'trade_id': trade_data.get('trade_id', f"trade_{len(self.daily_trades) + 1}")
-            }
-            
-            # Add to daily tracking
-            self.daily_trades.append(trade_record)
-            self.daily_risk_used += risk_amount
-            
+            risk_amount = float(trade_data['risk_amount'])
+            position_size = float(trade_data.get('position_size', 0))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"[DAILY_RISK] Invalid trade payload, not tracked: {e!r}")
+            return False
+        
+        self._ensure_current_date()
+        symbol = trade_data.get('symbol', 'UNKNOWN')
+        
+        # Create trade record
+        trade_record = TradeRecord(
+            timestamp=time.time(),
+            symbol=symbol,
+            position_size=position_size,
+            entry_price=trade_data.get('entry_price', 0),
+            sl_price=trade_data.get('sl_price', 0),
+            tp_price=trade_data.get('tp_price', 0),
+            risk_amount=risk_amount,
+            trade_id=trade_data.get('trade_id', f"trade_{len(self.daily_trades) + 1}")
+        )
+        
+        # Add to daily tracking
+        self._track_trade(trade_record)
+        
+        # Persist today's line now - can_trade needs it after a mid-day restart
+        if self.history_path:
+            self._append_history(self._current_day())
+        
+        # Guarded f-string keeps the thousands grouping without formatting dropped records
+        if logger.isEnabledFor(logging.INFO):
             logger.info(f"[DAILY_RISK] Trade added: {symbol} {position_size} lots, "
                        f"Risk: {risk_amount:,.0f} CZK, Daily total: {self.daily_risk_used:,.0f} CZK")
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"[DAILY_RISK] Error adding trade: {e}")
-            return False
+        
+        return True
     
-    def get_daily_status(self) -> Dict[str, Any]:
-        """Get current daily risk status"""
-        self._ensure_current_date()
+    def _track_trade(self, trade_record: TradeRecord):
+        """Add trade to today's list, risk total and per-symbol aggregates"""
+        self.daily_trades.append(trade_record)
+        self.daily_risk_used += trade_record.risk_amount
+        stats = self._symbol_stats.get(trade_record.symbol)
+        if stats is None:
+            stats = self._symbol_stats[trade_record.symbol] = {
+                'trades_count': 0,
+                'total_risk': 0.0,
+                'total_volume': 0.0,
+                'trades': []
+            }
+        stats['trades_count'] += 1
+        stats['total_risk'] += trade_record.risk_amount
+        stats['total_volume'] += trade_record.position_size
+        stats['trades'].append(trade_record)
+    
+    @staticmethod
+    def _export_trade(trade: TradeRecord) -> Dict[str, Any]:
+        """Trade record for output - plain dict with ISO local timestamp instead of epoch"""
+        # Explicit fields - dataclasses.asdict() deep-copies every value recursively
+        return {
+            'timestamp': datetime.fromtimestamp(trade.timestamp).isoformat(),
+            'symbol': trade.symbol,
+            'position_size': trade.position_size,
+            'entry_price': trade.entry_price,
+            'sl_price': trade.sl_price,
+            'tp_price': trade.tp_price,
+            'risk_amount': trade.risk_amount,
+            'trade_id': trade.trade_id
+        }
+    
+    def get_daily_status(self) -> Mapping[str, Any]:
+        """Get current daily risk status (read-only, shared until the inputs change)"""
+        daily_limit, _ = self._snapshot()
+        key = (self.current_date, daily_limit, self.daily_risk_used, len(self.daily_trades))
+        if key == self._status_key:
+            return self._status_view
         
-        daily_limit = self._get_daily_limit()
         remaining_risk = max(0, daily_limit - self.daily_risk_used)
         percentage_used = self.daily_risk_used / daily_limit if daily_limit > 0 else 0
         
-        # Calculate max trades remaining (assuming 0.5% per trade)
-        per_trade_risk = daily_limit / 3  # 1.5% / 3 = 0.5% per trade
-        max_trades_remaining = int(remaining_risk / per_trade_risk) if per_trade_risk > 0 else 0
+        # Calculate max trades remaining (assuming 0.5% per trade: 1.5% / 3)
+        max_trades_remaining = int(remaining_risk * _TRADES_PER_DAILY_LIMIT / daily_limit) if daily_limit > 0 else 0
         
-        return {
+        # New dict per change - views handed out earlier keep their snapshot
+        self._status_view = MappingProxyType({
             'date': self.current_date.isoformat() if self.current_date else None,
             'daily_limit': daily_limit,
             'risk_used': self.daily_risk_used,
@@ -283,7 +518,9 @@ class DailyRiskTracker:
             'trades_count': len(self.daily_trades),
             'max_trades_remaining': max_trades_remaining,
             'limit_percentage': self.daily_limit_percentage
-        }
+        })
+        self._status_key = key
+        return self._status_view
     
     def get_daily_summary(self) -> str:
         """Get human-readable daily summary"""
@@ -297,68 +534,56 @@ class DailyRiskTracker:
         risk_limit = status['daily_limit']
         trades_count = status['trades_count']
         
-        if percentage < 0.5:  # Less than 50%
-            indicator = "🟢"
-        elif percentage < 0.8:  # 50-80%
-            indicator = "🟡"
-        else:  # 80%+
-            indicator = "🔴"
+        indicator = _INDICATORS[(percentage >= 0.5) + (percentage >= 0.8)]
         
         return (f"{indicator} Daily risk: {risk_used:,.0f}/{risk_limit:,.0f} CZK "
                f"({percentage:.1%}) | {trades_count} trades")
     
     def get_risk_breakdown(self) -> Dict[str, Any]:
         """Get detailed risk breakdown for today"""
-        self._ensure_current_date()
+        daily_limit, _ = self._snapshot()
         
-        # Group trades by symbol
-        symbol_breakdown = {}
-        for trade in self.daily_trades:
-            symbol = trade['symbol']
-            if symbol not in symbol_breakdown:
-                symbol_breakdown[symbol] = {
-                    'trades_count': 0,
-                    'total_risk': 0.0,
-                    'total_volume': 0.0,
-                    'trades': []
-                }
-            
-            symbol_breakdown[symbol]['trades_count'] += 1
-            symbol_breakdown[symbol]['total_risk'] += trade['risk_amount']
-            symbol_breakdown[symbol]['total_volume'] += trade['position_size']
-            symbol_breakdown[symbol]['trades'].append(trade)
+        # Per-symbol totals are maintained by add_trade - no scan over all trades
+        export = self._export_trade
+        symbol_breakdown = {
+            symbol: {**stats, 'trades': [export(trade) for trade in stats['trades']]}
+            for symbol, stats in self._symbol_stats.items()
+        }
         
         return {
             'total_risk': self.daily_risk_used,
             'total_trades': len(self.daily_trades),
             'symbol_breakdown': symbol_breakdown,
-            'daily_limit': self._get_daily_limit()
+            'daily_limit': daily_limit
         }
     
+    def _history_lookup(self, day_ord: int) -> Optional[Dict]:
+        """Saved data for given date ordinal, None if not in history"""
+        slot = day_ord % len(self._history_ring)
+        if self._history_ord[slot] == day_ord:
+            return self._history_ring[slot]
+        return None
+    
     def get_recent_history(self, days: int = 7) -> List[Dict]:
         """Get recent daily history"""
-        # Get recent dates
-        end_date = datetime.now(ZoneInfo("Europe/Prague")).date()
+        # Also rolls yesterday into history if no call has done so since midnight
+        self._ensure_current_date()
+        
+        # Get recent dates by ordinal - built newest first, so no sort is needed
+        end_ord = self.current_date.toordinal()
+        lookup = self._history_lookup
+        export = self._export_trade
         dates = []
         
-        for i in range(days):
-            check_date = end_date - timedelta(days=i)
-            date_str = check_date.isoformat()
-            
-            if date_str in self.daily_history:
-                dates.append(self.daily_history[date_str])
+        for day_ord in range(end_ord, end_ord - days, -1):
+            day = lookup(day_ord)
+            if day is not None:
+                dates.append({**day, 'trades': [export(t) for t in day['trades']]})
             else:
-                # Add empty day
-                dates.append({
-                    'date': date_str,
-                    'risk_used': 0.0,
-                    'risk_limit': 0.0,
-                    'risk_percentage_used': 0.0,
-                    'trades_count': 0,
-                    'trades': []
-                })
-        
-        return sorted(dates, key=lambda x: x['date'], reverse=True)
+                # Add empty day (fresh trades list - callers may mutate the result)
+                dates.append({**_EMPTY_DAY, 'date': date.fromordinal(day_ord).isoformat(), 'trades': []})
+        
+        return dates
     
     def reset_daily_risk(self, new_date: date = None):
         """
@@ -368,7 +593,7 @@ class DailyRiskTracker:
             new_date: Date to reset to (default: today)
         """
         if new_date is None:
-            new_date = datetime.now(ZoneInfo("Europe/Prague")).date()
+            new_date = datetime.now(_PRAGUE).date()
             
         if self.current_date is not None:
             self._save_daily_data()
@@ -378,8 +603,6 @@ class DailyRiskTracker:
     
     def validate_daily_limits(self) -> Dict[str, Any]:
         """Validate current daily risk status"""
-        self._ensure_current_date()
-        
         status = self.get_daily_status()
         issues = []
         
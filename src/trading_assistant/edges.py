@@ -4,17 +4,32 @@ Wide Stops Strategy for M5
 25-09-03
 """
 
-from typing import List, Dict, Optional, Tuple, Any
+from typing import Callable, Iterable, List, Dict, Optional, Tuple, Any
 from dataclasses import dataclass
 from enum import Enum
 from datetime import datetime, timezone
 import logging
+from bisect import bisect_right
+from operator import itemgetter
 from .pullback_detector import PullbackDetector
 from .logging_config import LoggingConfig, LogLevel
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Column getters for bar dicts - map() over these runs in C (no per-bar generator frame)
+_HIGH = itemgetter('high')
+_LOW = itemgetter('low')
+_CLOSE = itemgetter('close')
+_OHLC = itemgetter('open', 'high', 'low', 'close')
+
+# Base SL podle ATR: < 30 / < 50 / < 80 / výš
+_BASE_SL_ATR_EDGES = (30.0, 50.0, 80.0)
+_BASE_SL = (150, 200, 250, 300)
+
+# Target RRR factor by confluence count (patterns + structure breaks), 3+ capped
+_RRR_FACTOR_BY_SIGNALS = (0.9, 0.9, 1.0, 1.2)
+
+@dataclass(slots=True)
 class Signal:
     """Trading signal data structure"""
     signal_type: 'SignalType'
@@ -33,6 +48,39 @@ class SignalType(Enum):
     BUY = "BUY"
     SELL = "SELL"
 
+# signal_type.value.lower() bez enum .value lookupu a alokace nového stringu
+_SIGNAL_NAME_LOWER = {SignalType.BUY: "buy", SignalType.SELL: "sell"}
+
+# _calculate_atr: rozlišení instrumentu podle ceny a ochrana proti špatným datům
+_ATR_INDEX_MIN_PRICE = 20000      # nad touto cenou index (DAX/NASDAQ), ATR v bodech
+_ATR_DAX_MIN_PRICE = 25000        # nad touto cenou DAX, jinak NASDAQ
+_ATR_INDEX_RAW_CAP = 500          # vyšší raw ATR u indexů = celý rozsah, ne M5 pohyb
+_ATR_DAX_TYPICAL = 30.0           # typické ATR pro DAX M5
+_ATR_NASDAQ_TYPICAL = 40.0        # typické ATR pro NASDAQ M5
+_ATR_OTHER_CAP = 100.0            # cap pro ostatní instrumenty
+
+# Kvalitní obchodní okna v minutách dne (lokální čas, CET)
+_QUALITY_WINDOW_DAX = range(9 * 60, 15 * 60 + 31)         # 9:00-15:30 včetně
+_QUALITY_WINDOW_NASDAQ = range(15 * 60 + 30, 22 * 60)     # 15:30-21:59
+
+# Oddělovače diagnostických logů
+_SEP_EQ = "=" * 60
+_SEP_DASH = "─" * 60
+_SEP_SEARCH = "🔍" * 60
+_SUMMARY_HEADER = "🔍" * 20 + " VALIDATION SUMMARY " + "🔍" * 20
+
+# Sdílený prázdný microstructure dict (jen pro čtení) - místo větvení na None
+_EMPTY_MICRO: Dict[str, Any] = {}
+
+# Microstructure bonusy (confidence, quality) po bitech masky:
+# bit0 volume z-score > 1.5, bit1 blízko VWAP, bit2 ORB ve směru signálu,
+# bit3 vysoká likvidita, bit4 high-quality time window
+_MICRO_BONUS_BITS = ((10, 0), (0, 10), (15, 10), (0, 5), (5, 0))
+_MICRO_CONF_BONUS = tuple(sum(c for bit, (c, _) in enumerate(_MICRO_BONUS_BITS) if mask >> bit & 1)
+                          for mask in range(1 << len(_MICRO_BONUS_BITS)))
+_MICRO_QUAL_BONUS = tuple(sum(q for bit, (_, q) in enumerate(_MICRO_BONUS_BITS) if mask >> bit & 1)
+                          for mask in range(1 << len(_MICRO_BONUS_BITS)))
+
 class PatternType(Enum):
     """Candlestick patterns"""
     PIN_BAR = "PIN_BAR"
@@ -40,7 +88,7 @@ class PatternType(Enum):
     INSIDE_BAR = "INSIDE_BAR"
     MOMENTUM = "MOMENTUM"
 
-@dataclass
+@dataclass(slots=True)
 class TradingSignal:
     """Complete trading signal with metadata"""
     signal_type: SignalType
@@ -71,6 +119,84 @@ class TradingSignal:
     last_swing_high: Optional[float] = None
     last_swing_low: Optional[float] = None
 
+def _wide_sl_distance(atr: float, regime: str, is_dax: bool, swing_quality: float,
+                      min_sl_points: float, max_sl_points: float) -> float:
+    """Čistá numerika základní SL vzdálenosti pro wide stops (bez logování)"""
+    # 1. Base SL according to volatility (low / medium / higher / high)
+    base_sl = _BASE_SL[bisect_right(_BASE_SL_ATR_EDGES, atr)]
+    
+    # 2. Adjust for market regime
+    if regime == 'TREND':
+        sl_distance = base_sl * 1.2  # Wider stops in trend
+    elif regime == 'RANGE':
+        sl_distance = base_sl * 0.8  # Tighter stops in range
+    else:
+        sl_distance = base_sl
+    
+    # 3. Adjust for symbol characteristics
+    if is_dax:
+        sl_distance = sl_distance * 0.9  # DAX moves less than NASDAQ
+    
+    # 4. Consider swing quality
+    if swing_quality > 70:
+        sl_distance = sl_distance * 0.9  # Tighter with high quality
+    elif swing_quality < 30:
+        sl_distance = sl_distance * 1.1  # Wider with low quality
+    
+    # 5. Apply configured limits
+    return max(min_sl_points, min(sl_distance, max_sl_points))
+
+def _true_ranges(bars: List[Dict]) -> List[float]:
+    """
+    True range of bars[1:], each against the previous bar's close
+    
+    Columns are pulled with itemgetter maps, so the comprehension does no dict
+    lookups; _calculate_atr sums the result in order (live and batch identical)
+    """
+    rest = bars[1:]
+    return [max(high - low, abs(high - prev_close), abs(low - prev_close))
+            for high, low, prev_close in zip(map(_HIGH, rest), map(_LOW, rest), map(_CLOSE, bars))]
+
+def _bar_patterns(prev_bar: Optional[Tuple[float, float, float, float]],
+                  bar: Tuple[float, float, float, float],
+                  pin_ratio: float, engulfing_min_size: float) -> Tuple[Optional[str], Optional[str], bool]:
+    """
+    Pin bar / engulfing / inside bar pro jeden bar v jednom průchodu
+    
+    Bars are (open, high, low, close); prev_bar None → only the pin bar is evaluated.
+    Returns (pin, engulfing, inside) with 'bullish'/'bearish'/None directions
+    """
+    o, h, l, c = bar
+    body = abs(c - o)
+    
+    # Pin bar - dominantní knot přes polovinu rozsahu (bez dělení: wick > range/2)
+    pin = None
+    half_range = (h - l) * 0.5
+    if half_range > 0:
+        upper_wick = h - max(c, o)
+        lower_wick = min(c, o) - l
+        if lower_wick > half_range and lower_wick > body * pin_ratio and lower_wick > upper_wick * 1.5:
+            pin = 'bullish'
+        elif upper_wick > half_range and upper_wick > body * pin_ratio and upper_wick > lower_wick * 1.5:
+            pin = 'bearish'
+    
+    if prev_bar is None:
+        return pin, None, False
+    prev_open, prev_high, prev_low, prev_close = prev_bar
+    
+    # Engulfing - tělo alespoň engulfing_min_size × předchozí tělo, opačná barva
+    engulfing = None
+    prev_body = abs(prev_close - prev_open)
+    if prev_body != 0 and not body < prev_body * engulfing_min_size:
+        if prev_close < prev_open and c > o and c > prev_open:
+            engulfing = 'bullish'
+        elif prev_close > prev_open and c < o and c < prev_open:
+            engulfing = 'bearish'
+    
+    # Inside bar
+    inside = h <= prev_high and l >= prev_low
+    return pin, engulfing, inside
+
 class EdgeDetector:
     """Edge detection with wide stops strategy for low pip values"""
     
@@ -130,16 +256,45 @@ class EdgeDetector:
         # Tick size
         self.tick_size = float(self.config.get('tick_size', 0.5))
         
+        # Symbol config for wide stops, resolved once: (target_position_lots, min_sl_points, max_sl_points)
+        symbol_specs = self.main_config.get('symbol_specs', {})
+        default_target_lots = self.main_config.get('target_position_lots', 12.0)
+        self._dax_sl_spec = self._wide_stop_spec(symbol_specs.get('DAX', {}), default_target_lots)
+        self._nasdaq_sl_spec = self._wide_stop_spec(symbol_specs.get('NASDAQ', {}), default_target_lots)
+        microstructure_config = self.main_config.get('microstructure', {})
+        self.min_liquidity_score = microstructure_config.get('min_liquidity_score', 0.3)
+        # is_quality_trading_time má historicky mírnější default (stejně jako gate v main.py)
+        self._quality_time_min_liquidity = microstructure_config.get('min_liquidity_score', 0.1)
+        # is_quality_trading_time: symbol → okno kvalitních minut dne (None = bez omezení)
+        self._quality_windows: Dict[str, Optional[range]] = {}
+        
         # Swing parameters
         self.swing_lookback = self.config.get('swing_lookback', 30)
         self.recent_swing_bars = self.config.get('recent_swing_bars', 10)
         self.swing_break_lookback = self.config.get('swing_break_lookback', 10)
         
+        # Precomputed EMA per period during detect_signals_batch, None otherwise
+        self._ema_series: Optional[Dict[int, List[float]]] = None
+        # True range per bar during detect_signals_batch, None otherwise
+        self._tr_series: Optional[List[float]] = None
+        
+        # Poslední výsledek pullback detektoru: (bar key, vstupní dicty, výsledek)
+        self._pullback_cache: Tuple[Any, Tuple, Optional[Dict]] = (None, (), None)
+        
         # State
         self.last_signal: Optional[TradingSignal] = None
         self.current_atr: float = 0
         self.current_symbol = None
         
+    @staticmethod
+    def _wide_stop_spec(symbol_spec: Dict, default_target_lots: float) -> Tuple[float, float, float]:
+        """(target_position_lots, min_sl_points, max_sl_points) for one symbol"""
+        return (
+            symbol_spec.get('target_position_lots', default_target_lots),
+            symbol_spec.get('min_sl_points', 150.0),
+            symbol_spec.get('max_sl_points', 400.0)
+        )
+    
     def detect_signals(self, 
                       bars: List[Dict],
                       regime_state: Dict,
@@ -157,7 +312,7 @@ class EdgeDetector:
             self.app.log(f"🔍 [SIGNAL_DETECT] Starting signal detection - bars={len(bars)}, price={current_price:.2f}, regime={regime_type}")
         
         if len(bars) < 20:
-            self._log_rejection("Insufficient bars for analysis", {
+            self._log_rejection("Insufficient bars for analysis", lambda: {
                 "bars_available": len(bars),
                 "minimum_required": 20
             })
@@ -166,7 +321,7 @@ class EdgeDetector:
         # Check cooldown
         if current_bar_index - self._last_signal_bar_index < self.min_bars_between_signals:
             bars_since_last = current_bar_index - self._last_signal_bar_index
-            self._log_rejection("Signal cooldown active", {
+            self._log_rejection("Signal cooldown active", lambda: {
                 "bars_since_last_signal": bars_since_last,
                 "minimum_required": self.min_bars_between_signals,
                 "cooldown_remaining": self.min_bars_between_signals - bars_since_last
@@ -231,7 +386,7 @@ class EdgeDetector:
                 if self.app:
                     self.app.log(f"🚫 [STRICT_FILTER] BLOCKED: regime={regime_type}, EMA34={ema34_trend}, reasons={', '.join(rejection_reason)}")
                 
-                self._log_rejection("STRICT Regime filter: Both regime and EMA34 must be in TREND", {
+                self._log_rejection("STRICT Regime filter: Both regime and EMA34 must be in TREND", lambda: {
                     "regime_type": regime_type,
                     "regime_regime": regime_regime,
                     "trend_direction": trend_direction,
@@ -248,8 +403,8 @@ class EdgeDetector:
                 if self.app:
                     self.app.log(f"✅ [STRICT_FILTER] PASSED: regime={regime_type}, EMA34={ema34_trend}, directions_match=True")
         
-        # Log what we're checking (periodically, not every bar)
-        if self.app and (current_bar_index % 12 == 0):  # Every 12 bars = 1 hour on M5
+        # Log what we're checking (periodically, not every bar) - jen při verbose/debug logování
+        if self.app and self.logging.log_rejections and current_bar_index % 12 == 0:  # Every 12 bars = 1 hour on M5
             self._log_validation_summary(bars, regime_state, swing_state, microstructure_data)
         
         # Check swing quality
@@ -260,7 +415,7 @@ class EdgeDetector:
             if not (regime == 'TREND' and adx > 25):
                 if self.app:
                     self.app.log(f"🚫 [SWING_QUALITY] BLOCKED: {swing_quality:.1f}% < {self.min_swing_quality:.1f}%, regime={regime}, ADX={adx:.1f}")
-                self._log_rejection("Low swing quality", {
+                self._log_rejection("Low swing quality", lambda: {
                     "current_swing_quality": f"{swing_quality:.1f}%",
                     "minimum_required": f"{self.min_swing_quality:.1f}%",
                     "regime": regime,
@@ -278,9 +433,18 @@ class EdgeDetector:
         if self.app:
             self.app.log(f"🔍 [PULLBACK_CHECK] Checking for pullback opportunities...")
         
-        pullback_opportunity = self.pullback_detector.detect_pullback_opportunity(
-            bars, regime_state, swing_state, pivot_levels, microstructure_data
-        )
+        # Opakovaná evaluace stejného baru se stejnými vstupy (retry, více volání) → bez nového skenu
+        last_bar = bars[-1]
+        pullback_key = (len(bars), last_bar.get('timestamp'), last_bar['close'])
+        pullback_inputs = (regime_state, swing_state, pivot_levels, microstructure_data)
+        cached_key, cached_inputs, cached_opportunity = self._pullback_cache
+        if cached_key == pullback_key and all(a is b for a, b in zip(cached_inputs, pullback_inputs)):
+            pullback_opportunity = cached_opportunity
+        else:
+            pullback_opportunity = self.pullback_detector.detect_pullback_opportunity(
+                bars, regime_state, swing_state, pivot_levels, microstructure_data
+            )
+            self._pullback_cache = (pullback_key, pullback_inputs, pullback_opportunity)
         
         if pullback_opportunity:
             if self.app:
@@ -289,14 +453,14 @@ class EdgeDetector:
             pullback_signal = self._create_pullback_signal(pullback_opportunity, bars, regime_state)
             if pullback_signal:
                 if self.app:
-                    self.app.log("=" * 60)
+                    self.app.log(_SEP_EQ)
                     self.app.log(f"[PULLBACK SIGNAL] {pullback_signal.signal_type.value} detected")
                     self.app.log(f"🎯 Type: {pullback_opportunity['pullback_type'].value}")
                     self.app.log(f"🎯 Entry: {pullback_signal.entry:.1f} ({pullback_opportunity['entry_reason']})")
                     self.app.log(f"🎯 Quality: {pullback_opportunity['quality_score']:.0f}%")
                     self.app.log(f"🎯 Confluence: {pullback_opportunity['confluence_levels']} levels")
                     self.app.log(f"🎯 Retracement: {pullback_opportunity.get('retracement_pct', 0):.1f}%")
-                    self.app.log("=" * 60)
+                    self.app.log(_SEP_EQ)
                 signals.append(pullback_signal)
                 self.last_signal = pullback_signal
                 self._last_signal_bar_index = current_bar_index
@@ -329,7 +493,7 @@ class EdgeDetector:
         if self.app:
             self.app.log(f"🔍 [PATTERN_DETECT] Checking for patterns and structure breaks...")
         
-        patterns = self._detect_patterns(bars, regime_state)
+        patterns, bullish_count, bearish_count = self._detect_patterns(bars, regime_state)
         
         # Check structure breaks
         structure_breaks = self._check_structure_breaks(bars, swing_state, pivot_levels)
@@ -343,7 +507,8 @@ class EdgeDetector:
         if patterns or structure_breaks:
             signal = self._evaluate_confluence_wide_stops(
                 bars, patterns, structure_breaks,
-                regime_state, pivot_levels, swing_state, microstructure_data
+                regime_state, pivot_levels, swing_state, microstructure_data,
+                direction_counts=(bullish_count, bearish_count)
             )
             
             if signal:
@@ -368,7 +533,7 @@ class EdgeDetector:
                     if self.app:
                         self.app.log(f"🚫 [SIGNAL_QUALITY] BLOCKED: {', '.join(reasons)}")
                     if reasons:
-                        self._log_rejection("Signal quality/confidence below threshold", {
+                        self._log_rejection("Signal quality/confidence below threshold", lambda: {
                             "signal_quality": f"{signal.signal_quality:.1f}%",
                             "min_signal_quality": f"{self.min_signal_quality}%",
                             "signal_confidence": f"{signal.confidence:.1f}%",
@@ -389,17 +554,49 @@ class EdgeDetector:
         
         return signals
     
+    def detect_signals_batch(self, bars: List[Dict],
+                             contexts: Iterable[Tuple[int, Dict, Dict, Dict, Optional[Dict]]]
+                             ) -> List[Tuple[int, TradingSignal]]:
+        """
+        Backtest entrypoint - detect_signals for many bars of one history
+        
+        EMA(34) and the per-bar true range (ATR input) are computed for the whole
+        history in one pass instead of from scratch on every bar; everything else
+        is the streaming logic unchanged (incl. cooldown, which counts bar indices).
+        
+        Args:
+            bars: Complete bar history
+            contexts: (index, regime_state, pivot_levels, swing_state, microstructure_data)
+                      per evaluated bar, ascending index
+            
+        Returns:
+            [(index, signal)] for every generated signal
+        """
+        events = []
+        self._ema_series = {34: self._ema_series_for(bars, 34)}
+        self._tr_series = self._tr_series_for(bars)
+        try:
+            for index, regime_state, pivot_levels, swing_state, microstructure_data in contexts:
+                for signal in self.detect_signals(bars[:index + 1], regime_state, pivot_levels,
+                                                  swing_state, microstructure_data):
+                    events.append((index, signal))
+        finally:
+            self._ema_series = None
+            self._tr_series = None
+        return events
+    
     def _create_pullback_signal(self, pullback_opportunity: Dict, bars: List[Dict], regime_state: Dict) -> Optional[TradingSignal]:
         """Create trading signal from pullback opportunity"""
         try:
-            signal_type = SignalType.BUY if pullback_opportunity['signal_direction'] == 'BUY' else SignalType.SELL
+            is_buy = pullback_opportunity['signal_direction'] == 'BUY'
+            signal_type = SignalType.BUY if is_buy else SignalType.SELL
             entry_price = pullback_opportunity['entry_price']
             
             # Calculate stop loss and take profit for pullback
             atr = self.current_atr
             
             # Pullback stops are tighter than standard wide stops
-            if signal_type == SignalType.BUY:
+            if is_buy:
                 # For pullback BUY in uptrend, SL below recent swing low
                 stop_loss = entry_price - (atr * 2.0)  # Tighter stop
                 take_profit = entry_price + (atr * 4.0)  # 1:2 RRR minimum
@@ -451,11 +648,16 @@ class EdgeDetector:
     def _evaluate_confluence_wide_stops(self, bars: List[Dict], patterns: List[Dict], 
                                    structure_breaks: List[Dict], regime_state: Dict,
                                    pivot_levels: Dict, swing_state: Dict, 
-                                   microstructure_data: Optional[Dict] = None) -> Optional[TradingSignal]:
-        """Evaluate patterns with SIMPLE WIDE STOPS strategy"""
+                                   microstructure_data: Optional[Dict] = None,
+                                   direction_counts: Optional[Tuple[int, int]] = None) -> Optional[TradingSignal]:
+        """
+        Evaluate patterns with SIMPLE WIDE STOPS strategy
+        
+        direction_counts: (bullish, bearish) from _detect_patterns; counted here if None
+        """
         
         if not patterns:
-            self._log_rejection("No patterns detected", {
+            self._log_rejection("No patterns detected", lambda: {
                 "bars_analyzed": len(bars),
                 "current_atr": f"{self.current_atr:.2f}",
                 "current_price": f"{bars[-1]['close']:.1f}" if bars else "N/A"
@@ -464,12 +666,23 @@ class EdgeDetector:
         
         current_price = bars[-1]['close']
         
+        # Stav režimu/swingu čteme jednou - níže se používají lokální proměnné
+        regime = regime_state.get('state', 'UNKNOWN')
+        trend_direction = regime_state.get('trend_direction')
+        adx_value = regime_state.get('adx', 0)
+        swing_quality = swing_state.get('quality', 50)
+        swing_trend = swing_state.get('trend', '')
+        micro = microstructure_data or _EMPTY_MICRO
+        
         # Determine signal direction
-        bullish_count = sum(1 for p in patterns if p.get('direction') == 'bullish')
-        bearish_count = sum(1 for p in patterns if p.get('direction') == 'bearish')
+        if direction_counts is not None:
+            bullish_count, bearish_count = direction_counts
+        else:
+            bullish_count = sum(1 for p in patterns if p.get('direction') == 'bullish')
+            bearish_count = sum(1 for p in patterns if p.get('direction') == 'bearish')
         
         if bullish_count == bearish_count:
-            self._log_rejection("Equal bullish/bearish signals", {
+            self._log_rejection("Equal bullish/bearish signals", lambda: {
                 "bullish_count": bullish_count,
                 "bearish_count": bearish_count,
                 "patterns": [f"{p.get('type', 'UNKNOWN')}: {p.get('direction', 'neutral')}" for p in patterns]
@@ -477,26 +690,26 @@ class EdgeDetector:
             return None
         
         # === MICROSTRUCTURE EARLY FILTERING ===
-        if microstructure_data:
+        if micro:
             # Liquidity gate - skip low liquidity periods
-            liquidity = microstructure_data.get('liquidity_score', 0.5)
-            min_liquidity = self.main_config.get('microstructure', {}).get('min_liquidity_score', 0.3)
+            liquidity = micro.get('liquidity_score', 0.5)
+            min_liquidity = self.min_liquidity_score
             if liquidity < min_liquidity:
-                self._log_rejection("Low liquidity", {
+                self._log_rejection("Low liquidity", lambda: {
                     "current_liquidity": f"{liquidity:.3f}",
                     "minimum_required": f"{min_liquidity:.2f}",
                     "microstructure_data": {
-                        "vwap_distance": f"{microstructure_data.get('vwap_distance', 0):.2f}%",
-                        "volume_zscore": f"{microstructure_data.get('volume_zscore', 0):.2f}",
-                        "is_high_quality_time": microstructure_data.get('is_high_quality_time', False)
+                        "vwap_distance": f"{micro.get('vwap_distance', 0):.2f}%",
+                        "volume_zscore": f"{micro.get('volume_zscore', 0):.2f}",
+                        "is_high_quality_time": micro.get('is_high_quality_time', False)
                     }
                 })
                 return None
             
             # ATR filtering - avoid extreme volatility
-            atr_data = microstructure_data.get('atr_analysis', {})
+            atr_data = micro.get('atr_analysis', {})
             if atr_data.get('is_elevated', False) and atr_data.get('ratio', 1.0) > 2.0:
-                self._log_rejection("Extreme volatility", {
+                self._log_rejection("Extreme volatility", lambda: {
                     "atr_ratio": f"{atr_data.get('ratio', 0):.2f}",
                     "maximum_allowed": "2.0",
                     "current_atr": f"{atr_data.get('current', 0):.2f}",
@@ -505,71 +718,24 @@ class EdgeDetector:
                 })
                 return None
         
-        # Get configuration
-        main_config = self.main_config or self.config.get('main_config', {})
-        
-        # Detect symbol based on price range
+        # Detect symbol based on price range - config limits resolved in __init__
         if current_price > 20000:
             symbol_alias = 'DAX'
-            symbol_name = 'DE40'
+            target_position, min_sl_points, max_sl_points = self._dax_sl_spec
         else:
             symbol_alias = 'NASDAQ'
-            symbol_name = 'US100'
-        
-        symbol_spec = main_config.get('symbol_specs', {}).get(symbol_alias, {})
-        
-        # Get parameters
-        pip_value = symbol_spec.get('pip_value_per_lot', 0.21)
-        target_position = symbol_spec.get('target_position_lots', main_config.get('target_position_lots', 12.0))
-        max_risk_czk = main_config.get('account_balance', 2000000) * main_config.get('max_risk_per_trade', 0.005)
-        
-        # Get configured limits
-        min_sl_points = symbol_spec.get('min_sl_points', 150.0)
-        max_sl_points = symbol_spec.get('max_sl_points', 400.0)
-        
-        # Calculate ATR
-        atr = self.current_atr if self.current_atr > 0 else self._calculate_atr(bars)
-        if atr <= 0:
-            atr = 50  # Fallback value
-        
-        # === SIMPLE SL CALCULATION ===
-        
-        # 1. Base SL according to volatility
-        if atr < 30:
-            base_sl = 150  # Low volatility
-        elif atr < 50:
-            base_sl = 200  # Medium volatility
-        elif atr < 80:
-            base_sl = 250  # Higher volatility
-        else:
-            base_sl = 300  # High volatility
-        
-        # 2. Adjust for market regime
-        regime = regime_state.get('state', 'UNKNOWN')
-        if regime == 'TREND':
-            sl_distance = base_sl * 1.2  # Wider stops in trend
-        elif regime == 'RANGE':
-            sl_distance = base_sl * 0.8  # Tighter stops in range
-        else:
-            sl_distance = base_sl
-        
-        # 3. Adjust for symbol characteristics
-        if symbol_alias == 'DAX':
-            sl_distance = sl_distance * 0.9  # DAX moves less than NASDAQ
+            target_position, min_sl_points, max_sl_points = self._nasdaq_sl_spec
         
-        # 4. Consider swing quality
-        swing_quality = swing_state.get('quality', 50)
-        if swing_quality > 70:
-            sl_distance = sl_distance * 0.9  # Tighter with high quality
-        elif swing_quality < 30:
-            sl_distance = sl_distance * 1.1  # Wider with low quality
+        # ATR spočítal detect_signals() nad stejnými bary - 0 jen u degenerovaných (plochých) dat
+        atr = self.current_atr if self.current_atr > 0 else 50  # Fallback value
         
-        # 5. Apply configured limits
-        sl_distance = max(min_sl_points, min(sl_distance, max_sl_points))
+        # === SIMPLE SL CALCULATION (steps 1-5, see _wide_sl_distance) ===
+        sl_distance = _wide_sl_distance(atr, regime, symbol_alias == 'DAX', swing_quality,
+                                        min_sl_points, max_sl_points)
         
         # 5.5 MICROSTRUCTURE SL ADJUSTMENTS
-        if microstructure_data:
-            atr_data = microstructure_data.get('atr_analysis', {})
+        if micro:
+            atr_data = micro.get('atr_analysis', {})
             
             # Widen stops during elevated volatility
             if atr_data.get('is_elevated', False):
@@ -581,7 +747,7 @@ class EdgeDetector:
             # Tighten stops during low volatility (remove dependency on micro_bonus_conf)
             elif atr_data.get('ratio', 1.0) < 0.8:
                 # Check if we have high liquidity as a proxy for high confidence
-                liquidity = microstructure_data.get('liquidity_score', 0.5)
+                liquidity = micro.get('liquidity_score', 0.5)
                 if liquidity > 0.7:
                     sl_adjustment = 0.9
                     sl_distance = sl_distance * sl_adjustment
@@ -592,16 +758,14 @@ class EdgeDetector:
         if len(bars) >= 10:
             recent_bars = bars[-10:]
             if bullish_count > bearish_count:  # BUY
-                recent_lows = [b['low'] for b in recent_bars]
-                nearest_swing = max(recent_lows) if recent_lows else current_price - sl_distance
+                nearest_swing = max(map(_LOW, recent_bars))  # recent_bars má vždy 10 prvků
                 natural_sl = current_price - nearest_swing
                 
                 # Use swing only if it's reasonable
                 if natural_sl > sl_distance * 0.5 and natural_sl < sl_distance * 1.5:
                     sl_distance = natural_sl
             else:  # SELL
-                recent_highs = [b['high'] for b in recent_bars]
-                nearest_swing = min(recent_highs) if recent_highs else current_price + sl_distance
+                nearest_swing = min(map(_HIGH, recent_bars))
                 natural_sl = nearest_swing - current_price
                 
                 if natural_sl > sl_distance * 0.5 and natural_sl < sl_distance * 1.5:
@@ -625,8 +789,8 @@ class EdgeDetector:
                 validated_breaks.append(sb)
             elif sb.get('validated', False):
                 # Samotný breakout musí mít volume confirmation
-                if microstructure_data:
-                    volume_zscore = microstructure_data.get('volume_zscore', 0)
+                if micro:
+                    volume_zscore = micro.get('volume_zscore', 0)
                     if volume_zscore >= 1.0:
                         validated_breaks.append(sb)
                         if self.app and self.logging.should_log('breakout', f"validated:{sb.get('type')}"):
@@ -657,12 +821,8 @@ class EdgeDetector:
         
         total_signals = pattern_count + structure_count
         
-        if total_signals >= 3:
-            target_rrr = base_rrr * 1.2  # Strong confluence
-        elif total_signals >= 2:
-            target_rrr = base_rrr
-        else:
-            target_rrr = base_rrr * 0.9  # Weaker signal
+        # Strong confluence (3+) / normal (2) / weaker signal
+        target_rrr = base_rrr * _RRR_FACTOR_BY_SIGNALS[min(total_signals, 3)]
         
         # Ensure minimum RRR
         target_rrr = max(1.5, target_rrr)
@@ -673,11 +833,6 @@ class EdgeDetector:
         # STRICT: Only allow signals WITH the trend direction (no counter-trend entries)
         # Allow pullback entries in trend direction only
         
-        # Get trend direction from regime
-        trend_direction = regime_state.get('trend_direction')
-        regime_type = regime_state.get('state', 'UNKNOWN')
-        adx_value = regime_state.get('adx', 0)
-        
         # === EMA(34) TREND CHECK - PRIORITA PRO RANGE REŽIM ===
         # Pokud regime detekuje RANGE, ale EMA34 ukazuje jasný trend, použijeme EMA trend
         # EMA34 je spolehlivější pro detekci aktuálního trendu než regime detector
@@ -707,10 +862,10 @@ class EdgeDetector:
             # We have a clear trend direction - block counter-trend signals
             if signal_wants_buy and trend_direction != 'UP':
                 # Want to go long but trend is down - REJECT (counter-trend)
-                self._log_rejection("Trend filter: BUY signal against trend (counter-trend blocked)", {
+                self._log_rejection("Trend filter: BUY signal against trend (counter-trend blocked)", lambda: {
                     "signal_direction": "BUY",
                     "trend_direction": trend_direction,
-                    "regime_type": regime_type,
+                    "regime_type": regime,
                     "adx": adx_value,
                     "bullish_count": bullish_count,
                     "bearish_count": bearish_count,
@@ -719,10 +874,10 @@ class EdgeDetector:
                 return None
             elif signal_wants_sell and trend_direction != 'DOWN':
                 # Want to go short but trend is up - REJECT (counter-trend)
-                self._log_rejection("Trend filter: SELL signal against trend (counter-trend blocked)", {
+                self._log_rejection("Trend filter: SELL signal against trend (counter-trend blocked)", lambda: {
                     "signal_direction": "SELL", 
                     "trend_direction": trend_direction,
-                    "regime_type": regime_type,
+                    "regime_type": regime,
                     "adx": adx_value,
                     "bullish_count": bullish_count,
                     "bearish_count": bearish_count,
@@ -733,10 +888,10 @@ class EdgeDetector:
             # === BLOCK SIGNALS AT SWING EXTREMES IN TRENDS ===
             # V trendech generujeme signály jen na pullbacku, ne na vrcholu swingu
             if self._is_at_swing_extreme(bars, swing_state, trend_direction):
-                self._log_rejection("Trend filter: Signal at swing extreme (pullback required)", {
+                self._log_rejection("Trend filter: Signal at swing extreme (pullback required)", lambda: {
                     "signal_direction": "BUY" if signal_wants_buy else "SELL",
                     "trend_direction": trend_direction,
-                    "regime_type": regime_type,
+                    "regime_type": regime,
                     "adx": adx_value,
                     "reason": "In trends, signals only allowed on pullbacks, not at swing extremes",
                     "swing_state": {
@@ -749,10 +904,10 @@ class EdgeDetector:
             # === REQUIRE PULLBACK ZONE FOR TREND SIGNALS ===
             # Zkontrolujeme, zda je cena v pullback zóně (ne na vrcholu)
             if not self._is_in_pullback_zone(bars, swing_state, trend_direction):
-                self._log_rejection("Trend filter: Signal not in pullback zone", {
+                self._log_rejection("Trend filter: Signal not in pullback zone", lambda: {
                     "signal_direction": "BUY" if signal_wants_buy else "SELL",
                     "trend_direction": trend_direction,
-                    "regime_type": regime_type,
+                    "regime_type": regime,
                     "current_price": current_price,
                     "reason": "In trends, signals only allowed in pullback zones",
                     "swing_state": {
@@ -771,9 +926,9 @@ class EdgeDetector:
             if signal_wants_buy:
                 # BUY signál v RANGE - blokovat pokud je na swing high
                 if self._is_at_swing_extreme_for_range(bars, swing_state, 'BUY'):
-                    self._log_rejection("Range filter: BUY signal at swing high (extreme blocked)", {
+                    self._log_rejection("Range filter: BUY signal at swing high (extreme blocked)", lambda: {
                         "signal_direction": "BUY",
-                        "regime_type": regime_type,
+                        "regime_type": regime,
                         "adx": adx_value,
                         "current_price": current_price,
                         "reason": "In range markets, BUY signals blocked at swing highs",
@@ -786,9 +941,9 @@ class EdgeDetector:
             elif signal_wants_sell:
                 # SELL signál v RANGE - blokovat pokud je na swing low
                 if self._is_at_swing_extreme_for_range(bars, swing_state, 'SELL'):
-                    self._log_rejection("Range filter: SELL signal at swing low (extreme blocked)", {
+                    self._log_rejection("Range filter: SELL signal at swing low (extreme blocked)", lambda: {
                         "signal_direction": "SELL",
-                        "regime_type": regime_type,
+                        "regime_type": regime,
                         "adx": adx_value,
                         "current_price": current_price,
                         "reason": "In range markets, SELL signals blocked at swing lows",
@@ -801,7 +956,8 @@ class EdgeDetector:
         
         # === SET FINAL LEVELS ===
         
-        if bullish_count > bearish_count:  # BUY SIGNAL
+        pivot_adjusted = False  # TP posunuto k pivotu → ex-post RRR je třeba přepočítat
+        if signal_wants_buy:  # BUY SIGNAL
             signal_type = SignalType.BUY
             entry = current_price
             stop_loss = entry - sl_distance
@@ -818,6 +974,7 @@ class EdgeDetector:
                     distance_to_r2 = r2 - entry
                     if distance_to_r2 > sl_distance * 1.5 and distance_to_r2 < tp_distance * 1.5:
                         take_profit = r2 - (atr * 0.1)  # Just before R2
+                        pivot_adjusted = True
                         tp_distance = take_profit - entry
                         if self.app:
                             self.app.log(f"[PIVOT_TP] Adjusted TP to R2: {take_profit:.2f} (distance: {distance_to_r2:.2f})")
@@ -826,6 +983,7 @@ class EdgeDetector:
                     distance_to_r1 = r1 - entry
                     if distance_to_r1 > sl_distance * 1.5 and distance_to_r1 < tp_distance * 1.5:
                         take_profit = r1 - (atr * 0.1)  # Just before R1
+                        pivot_adjusted = True
                         tp_distance = take_profit - entry
                         if self.app:
                             self.app.log(f"[PIVOT_TP] Adjusted TP to R1: {take_profit:.2f} (distance: {distance_to_r1:.2f})")
@@ -847,6 +1005,7 @@ class EdgeDetector:
                     distance_to_s2 = entry - s2
                     if distance_to_s2 > sl_distance * 1.5 and distance_to_s2 < tp_distance * 1.5:
                         take_profit = s2 + (atr * 0.1)  # Just after S2
+                        pivot_adjusted = True
                         tp_distance = entry - take_profit
                         if self.app:
                             self.app.log(f"[PIVOT_TP] Adjusted TP to S2: {take_profit:.2f} (distance: {distance_to_s2:.2f})")
@@ -855,14 +1014,14 @@ class EdgeDetector:
                     distance_to_s1 = entry - s1
                     if distance_to_s1 > sl_distance * 1.5 and distance_to_s1 < tp_distance * 1.5:
                         take_profit = s1 + (atr * 0.1)  # Just after S1
+                        pivot_adjusted = True
                         tp_distance = entry - take_profit
                         if self.app:
                             self.app.log(f"[PIVOT_TP] Adjusted TP to S1: {take_profit:.2f} (distance: {distance_to_s1:.2f})")
 
         # === CALCULATE INITIAL QUALITY SCORE ===
         signal_quality = 60  # Base quality
-        swing_quality_score = swing_state.get('quality', 50)
-        if swing_quality_score > 60:
+        if swing_quality > 60:
             signal_quality += 15
         
         # === PIVOT CONFLUENCE BONUS ===
@@ -901,7 +1060,7 @@ class EdgeDetector:
         # Validate minimum RRR (initial check) - PHASE 1: Use config value
         min_rrr_required = self.min_rr_ratio  # From config (2.0 after PHASE 1)
         if rrr < min_rrr_required:
-            self._log_rejection("Risk/Reward ratio too low", {
+            self._log_rejection("Risk/Reward ratio too low", lambda: {
                 "calculated_rrr": f"{rrr:.2f}",
                 "minimum_required": f"{min_rrr_required:.2f}",
                 "sl_distance": f"{sl_distance:.1f}",
@@ -920,15 +1079,20 @@ class EdgeDetector:
         
         # === EX-POST RRR VALIDATION (after all TP adjustments) ===
 
-        # Recalculate final RRR after all pivot/clamping adjustments
-        final_sl_distance = abs(entry - stop_loss)
-        final_tp_distance = abs(take_profit - entry)
-        final_rrr = final_tp_distance / final_sl_distance if final_sl_distance > 0 else 0
+        # Recalculate final RRR after pivot adjustments (jinak platí hodnoty výše)
+        if pivot_adjusted:
+            final_sl_distance = abs(entry - stop_loss)
+            final_tp_distance = abs(take_profit - entry)
+            final_rrr = final_tp_distance / final_sl_distance if final_sl_distance > 0 else 0
+        else:
+            final_sl_distance = sl_distance
+            final_tp_distance = tp_distance
+            final_rrr = rrr
 
         # Validate final RRR meets minimum requirements
         min_rrr_required = self.min_rr_ratio  # From config (usually 1.5)
         if final_rrr < min_rrr_required:
-            self._log_rejection("Ex-post RRR validation failed", {
+            self._log_rejection("Ex-post RRR validation failed", lambda: {
                 "initial_rrr": f"{rrr:.2f}",
                 "final_rrr_after_adjustments": f"{final_rrr:.2f}",
                 "minimum_required": f"{min_rrr_required:.2f}",
@@ -966,7 +1130,7 @@ class EdgeDetector:
             confidence += 10
         if structure_count > 0:
             confidence += 10
-        if regime == 'TREND' and signal_type.value.lower() == swing_state.get('trend', '').lower():
+        if regime == 'TREND' and swing_trend.lower() == _SIGNAL_NAME_LOWER[signal_type]:
             confidence += 10
 
         # Update signal quality
@@ -981,117 +1145,112 @@ class EdgeDetector:
         micro_bonus_conf = 0
         micro_bonus_qual = 0
         
-        if microstructure_data:
-            liquidity = microstructure_data.get('liquidity_score', 0.5)
-            
-            # Volume confirmation for breakouts
-            volume_zscore = microstructure_data.get('volume_zscore', 0)
-            if volume_zscore > 1.5:
-                micro_bonus_conf += 10
-                if self.app:
+        if micro:
+            liquidity = micro.get('liquidity_score', 0.5)
+            volume_zscore = micro.get('volume_zscore', 0)
+            vwap_distance = abs(micro.get('vwap_distance', 999))
+            or_data = micro.get('opening_range', {})
+            orb_direction = or_data.get('orb_direction') if or_data.get('orb_triggered') else None
+            
+            # Bitová maska podmínek → bonusy z předpočítané tabulky (viz _MICRO_BONUS_BITS)
+            mask = ((volume_zscore > 1.5)                                           # volume confirmation
+                    | (vwap_distance < 0.3) << 1                                    # within 0.3% of VWAP
+                    | (orb_direction == ('LONG' if signal_wants_buy else 'SHORT')) << 2  # ORB alignment
+                    | (liquidity > 0.7) << 3                                        # high liquidity
+                    | bool(micro.get('is_high_quality_time', False)) << 4)          # time-based quality
+            micro_bonus_conf = _MICRO_CONF_BONUS[mask]
+            micro_bonus_qual = _MICRO_QUAL_BONUS[mask]
+            
+            if self.app and mask:
+                if mask & 1:
                     self.app.log(f"[MICRO] High volume Z-score {volume_zscore:.2f}, +10% confidence")
-            
-            # VWAP confluence
-            vwap_distance = abs(microstructure_data.get('vwap_distance', 999))
-            if vwap_distance < 0.3:  # Within 0.3% of VWAP
-                micro_bonus_qual += 10
-                if self.app:
+                if mask & 2:
                     self.app.log(f"[MICRO] Near VWAP ({vwap_distance:.2f}%), +10% quality")
-            
-            # ORB alignment bonus
-            or_data = microstructure_data.get('opening_range', {})
-            if or_data.get('orb_triggered'):
-                orb_direction = or_data.get('orb_direction')
-                if (orb_direction == 'LONG' and signal_type == SignalType.BUY) or \
-                   (orb_direction == 'SHORT' and signal_type == SignalType.SELL):
-                    micro_bonus_conf += 15
-                    micro_bonus_qual += 10
-                    if self.app:
-                        self.app.log(f"[MICRO] ORB alignment {orb_direction}, +15% conf, +10% qual")
-            
-            # High liquidity bonus
-            if liquidity > 0.7:
-                micro_bonus_qual += 5
-                if self.app:
+                if mask & 4:
+                    self.app.log(f"[MICRO] ORB alignment {orb_direction}, +15% conf, +10% qual")
+                if mask & 8:
                     self.app.log(f"[MICRO] High liquidity {liquidity:.2f}, +5% quality")
-            
-            # Time-based quality
-            if microstructure_data.get('is_high_quality_time', False):
-                micro_bonus_conf += 5
-                if self.app:
+                if mask & 16:
                     self.app.log(f"[MICRO] High quality time window, +5% confidence")
         
         confidence = min(90, confidence + micro_bonus_conf)
         signal_quality = min(95, signal_quality + micro_bonus_qual)
         
         # === COMPREHENSIVE SIGNAL DIAGNOSTICS ===
-        if self.app:
-            self.app.log("=" * 60)
-            self.app.log(f"[SIGNAL DIAGNOSTICS] {signal_type.value} Signal Generated")
-            self.app.log("=" * 60)
+        # Vypnuto (logging.signal_diagnostics: false) → žádné formátování ~30 řádků
+        if self.app and self.logging.log_signal_diagnostics:
+            # Celý blok jako jeden app.log - jedno volání místo ~30
+            lines = []
+            add = lines.append
+            add(_SEP_EQ)
+            add(f"[SIGNAL DIAGNOSTICS] {signal_type.value} Signal Generated")
+            add(_SEP_EQ)
             
             # Core conditions
-            self.app.log(f"📊 CORE CONDITIONS:")
-            self.app.log(f"   • Bullish Count: {bullish_count}")
-            self.app.log(f"   • Bearish Count: {bearish_count}")
-            self.app.log(f"   • Direction: {'LONG' if bullish_count > bearish_count else 'SHORT'}")
+            add("📊 CORE CONDITIONS:")
+            add(f"   • Bullish Count: {bullish_count}")
+            add(f"   • Bearish Count: {bearish_count}")
+            add(f"   • Direction: {'LONG' if bullish_count > bearish_count else 'SHORT'}")
             
             # Trend alignment
-            self.app.log(f"📈 TREND ALIGNMENT:")
-            self.app.log(f"   • Regime: {regime} ({regime_state.get('state', 'UNKNOWN')})")
-            self.app.log(f"   • Trend Direction: {trend_direction}")
-            self.app.log(f"   • Trend Filter: {'✅ PASSED' if regime_type != 'TREND' or not trend_direction or (signal_type.value == 'BUY' and trend_direction == 'UP') or (signal_type.value == 'SELL' and trend_direction == 'DOWN') else '❌ FAILED'}")
+            add("📈 TREND ALIGNMENT:")
+            add(f"   • Regime: {regime} ({regime})")  # původní formát: typ režimu i stav (dnes totéž)
+            add(f"   • Trend Direction: {trend_direction}")
+            trend_filter_ok = (regime != 'TREND' or not trend_direction
+                               or trend_direction == ('UP' if signal_wants_buy else 'DOWN'))
+            add(f"   • Trend Filter: {'✅ PASSED' if trend_filter_ok else '❌ FAILED'}")
             
             # Pattern analysis
-            self.app.log(f"🔍 PATTERNS DETECTED:")
+            add("🔍 PATTERNS DETECTED:")
             if patterns:
                 for p in patterns:
-                    self.app.log(f"   • {p.get('type', 'UNKNOWN')}: {p.get('direction', 'neutral')} (conf: {p.get('confidence', 0):.1f}%)")
+                    add(f"   • {p.get('type', 'UNKNOWN')}: {p.get('direction', 'neutral')} (conf: {p.get('confidence', 0):.1f}%)")
             else:
-                self.app.log(f"   • No patterns detected")
+                add("   • No patterns detected")
             
             # Structure breaks
-            self.app.log(f"🏗️ STRUCTURE ANALYSIS:")
+            add("🏗️ STRUCTURE ANALYSIS:")
             if structure_breaks:
                 for sb in structure_breaks:
-                    self.app.log(f"   • {sb.get('type', 'UNKNOWN')}: {sb.get('direction', 'neutral')} (conf: {sb.get('confidence', 0):.1f}%)")
+                    add(f"   • {sb.get('type', 'UNKNOWN')}: {sb.get('direction', 'neutral')} (conf: {sb.get('confidence', 0):.1f}%)")
             else:
-                self.app.log(f"   • No structure breaks")
+                add("   • No structure breaks")
             
             # Pivot levels
-            self.app.log(f"📊 PIVOT LEVELS:")
+            add("📊 PIVOT LEVELS:")
             if pivot_levels:
-                current_price = bars[-1]['close']
-                atr = self.current_atr
-                tolerance = atr * 0.3
+                # Lokální proměnné - diagnostika nesmí měnit atr/cenu použité pro signál
+                diag_atr = self.current_atr
+                tolerance = diag_atr * 0.3
                 for level_name, level_price in pivot_levels.items():
                     if isinstance(level_price, (int, float)) and level_price > 0:
                         distance = abs(current_price - level_price)
-                        distance_atr = distance / atr if atr > 0 else 999
+                        distance_atr = distance / diag_atr if diag_atr > 0 else 999
                         status = "✅ NEAR" if distance <= tolerance else "   "
-                        self.app.log(f"   {status} {level_name}: {level_price:.2f} (distance: {distance:.2f} = {distance_atr:.2f} ATR)")
+                        add(f"   {status} {level_name}: {level_price:.2f} (distance: {distance:.2f} = {distance_atr:.2f} ATR)")
             else:
-                self.app.log(f"   • No pivot levels available")
+                add("   • No pivot levels available")
             
             # Microstructure bonuses
-            self.app.log(f"🔬 MICROSTRUCTURE BONUSES:")
-            self.app.log(f"   • Confidence Bonus: +{micro_bonus_conf}%")
-            self.app.log(f"   • Quality Bonus: +{micro_bonus_qual}%")
-            if microstructure_data:
-                self.app.log(f"   • Liquidity: {microstructure_data.get('liquidity_score', 0):.2f}")
-                self.app.log(f"   • VWAP Distance: {microstructure_data.get('vwap_distance', 999):.2f}%")
-                self.app.log(f"   • High Quality Time: {microstructure_data.get('is_high_quality_time', False)}")
+            add("🔬 MICROSTRUCTURE BONUSES:")
+            add(f"   • Confidence Bonus: +{micro_bonus_conf}%")
+            add(f"   • Quality Bonus: +{micro_bonus_qual}%")
+            if micro:
+                add(f"   • Liquidity: {micro.get('liquidity_score', 0):.2f}")
+                add(f"   • VWAP Distance: {micro.get('vwap_distance', 999):.2f}%")
+                add(f"   • High Quality Time: {micro.get('is_high_quality_time', False)}")
             
             # Final metrics
-            self.app.log(f"📋 FINAL METRICS:")
-            self.app.log(f"   • Entry: {entry:.1f}")
-            self.app.log(f"   • Stop Loss: {stop_loss:.1f} ({sl_distance:.1f} points)")
-            self.app.log(f"   • Take Profit: {take_profit:.1f} ({tp_distance:.1f} points)")
-            self.app.log(f"   • Risk/Reward: {rrr:.2f}:1")
-            self.app.log(f"   • Quality Score: {signal_quality:.1f}%")
-            self.app.log(f"   • Confidence: {confidence:.1f}%")
-            self.app.log(f"   • ATR: {atr:.1f}")
-            self.app.log("=" * 60)
+            add("📋 FINAL METRICS:")
+            add(f"   • Entry: {entry:.1f}")
+            add(f"   • Stop Loss: {stop_loss:.1f} ({sl_distance:.1f} points)")
+            add(f"   • Take Profit: {take_profit:.1f} ({tp_distance:.1f} points)")
+            add(f"   • Risk/Reward: {rrr:.2f}:1")
+            add(f"   • Quality Score: {signal_quality:.1f}%")
+            add(f"   • Confidence: {confidence:.1f}%")
+            add(f"   • ATR: {atr:.1f}")
+            add(_SEP_EQ)
+            self.app.log("\n".join(lines))
         
         # Create final signal with microstructure and swing context
         signal = TradingSignal(
@@ -1101,6 +1260,7 @@ class EdgeDetector:
             take_profit=take_profit,
             confidence=confidence,
             signal_quality=signal_quality,
+            # Tagy se formátují jen pro signál, který prošel všemi filtry (konzumenti je čtou vždy)
             patterns=[f"{p.get('type', 'UNKNOWN')}_{p.get('direction', 'neutral').upper()}"
                     for p in patterns],
             timestamp=datetime.now(timezone.utc),
@@ -1112,11 +1272,11 @@ class EdgeDetector:
             regime_state=regime,
             swing_trend=swing_state.get('trend', 'NEUTRAL'),
             # Add microstructure data for analytics
-            liquidity_score=microstructure_data.get('liquidity') if microstructure_data else None,
-            volume_zscore=microstructure_data.get('volume_zscore') if microstructure_data else None,
-            vwap_distance_pct=microstructure_data.get('vwap_distance_pct') if microstructure_data else None,
-            orb_triggered=microstructure_data.get('orb_triggered', False) if microstructure_data else False,
-            high_quality_time=microstructure_data.get('is_high_quality_time', False) if microstructure_data else False,
+            liquidity_score=micro.get('liquidity'),
+            volume_zscore=micro.get('volume_zscore'),
+            vwap_distance_pct=micro.get('vwap_distance_pct'),
+            orb_triggered=micro.get('orb_triggered', False),
+            high_quality_time=micro.get('is_high_quality_time', False),
             # Add swing context for analytics
             swing_quality_score=swing_state.get('quality_score'),
             last_swing_high=swing_state.get('last_swing_high'),
@@ -1125,58 +1285,71 @@ class EdgeDetector:
 
         return signal
     
-    def _log_rejection(self, reason: str, details: Dict = None):
-        """Log why a signal was rejected with comprehensive diagnostics"""
+    def _log_rejection(self, reason: str, details: Callable[[], Dict] = None):
+        """
+        Log why a signal was rejected with comprehensive diagnostics
+        
+        details is a callable building the dict - called only when the rejection
+        is actually logged (most bars are rejected, usually with logging off)
+        """
         if not self.app:
             return
         
-        # Check if should log based on log level and throttling
-        message_key = f"{reason}:{str(details.get('regime_type', ''))}:{str(details.get('signal_direction', ''))}"
-        
         # === BYPASS THROTTLING FOR STRICT REGIME FILTER ===
         # Always log strict regime filter rejections (critical for debugging)
-        if "STRICT Regime filter" in reason:
-            # Always log - bypass throttling
-            pass  # Continue to log
-        elif not self.logging.should_log('rejection', message_key):
+        strict_filter = "STRICT Regime filter" in reason
+        if not strict_filter and not self.logging.log_rejections:
             return
-            
-        self.app.log("─" * 60)
-        self.app.log(f"❌ [SIGNAL REJECTED] {reason}")
-        self.app.log("─" * 60)
+        
+        details = details() if details else {}
+        
+        # Check if should log based on log level and throttling
+        if not strict_filter:
+            message_key = f"{reason}:{str(details.get('regime_type', ''))}:{str(details.get('signal_direction', ''))}"
+            if not self.logging.should_log('rejection', message_key):
+                return
+        
+        lines = []
+        add = lines.append
+        add(_SEP_DASH)
+        add(f"❌ [SIGNAL REJECTED] {reason}")
+        add(_SEP_DASH)
         
         if details:
             for key, value in details.items():
                 if isinstance(value, dict):
-                    self.app.log(f"📊 {key.upper()}:")
+                    add(f"📊 {key.upper()}:")
                     for subkey, subvalue in value.items():
-                        self.app.log(f"   • {subkey}: {subvalue}")
+                        add(f"   • {subkey}: {subvalue}")
                 else:
-                    self.app.log(f"📊 {key}: {value}")
+                    add(f"📊 {key}: {value}")
         
-        self.app.log("─" * 60)
+        add(_SEP_DASH)
+        self.app.log("\n".join(lines))
     
     def _log_validation_summary(self, bars: List[Dict], regime_state: Dict, 
                                swing_state: Dict, microstructure_data: Dict = None):
-        """Log comprehensive validation summary - what was checked"""
-        if not self.app:
+        """Log comprehensive validation summary - what was checked (verbose/debug only)"""
+        if not self.app or not self.logging.log_rejections:
             return
-            
-        self.app.log("🔍" * 20 + " VALIDATION SUMMARY " + "🔍" * 20)
-        self.app.log(f"📊 BASIC CHECKS:")
-        self.app.log(f"   ✅ Bars available: {len(bars)} (min: 20)")
-        self.app.log(f"   ✅ ATR calculated: {self.current_atr:.2f}")
-        self.app.log(f"   ✅ Cooldown check: {self._last_signal_bar_index} bars ago (min: {self.min_bars_between_signals})")
         
-        self.app.log(f"📈 MARKET CONDITIONS:")
+        lines = []
+        add = lines.append
+        add(_SUMMARY_HEADER)
+        add("📊 BASIC CHECKS:")
+        add(f"   ✅ Bars available: {len(bars)} (min: 20)")
+        add(f"   ✅ ATR calculated: {self.current_atr:.2f}")
+        add(f"   ✅ Cooldown check: {self._last_signal_bar_index} bars ago (min: {self.min_bars_between_signals})")
+        
+        add("📈 MARKET CONDITIONS:")
         regime = regime_state.get('state', 'UNKNOWN')
         adx = regime_state.get('adx', 0)
         trend_dir = regime_state.get('trend_direction')
-        self.app.log(f"   • Regime: {regime} (ADX: {adx:.1f})")
-        self.app.log(f"   • Trend Direction: {trend_dir}")
+        add(f"   • Regime: {regime} (ADX: {adx:.1f})")
+        add(f"   • Trend Direction: {trend_dir}")
         
         swing_quality = swing_state.get('quality', 0)
-        self.app.log(f"   • Swing Quality: {swing_quality:.1f}% (min: {self.min_swing_quality})")
+        add(f"   • Swing Quality: {swing_quality:.1f}% (min: {self.min_swing_quality})")
         
         if microstructure_data:
             liquidity = microstructure_data.get('liquidity_score', 0)
@@ -1184,34 +1357,48 @@ class EdgeDetector:
             quality_time = microstructure_data.get('is_high_quality_time', False)
             atr_data = microstructure_data.get('atr_analysis', {})
 
-            # Get min_liquidity from config
-            min_liquidity = self.main_config.get('microstructure', {}).get('min_liquidity_score', 0.3)
+            min_liquidity = self.min_liquidity_score
 
-            self.app.log(f"🔬 MICROSTRUCTURE:")
-            self.app.log(f"   • Liquidity: {liquidity:.3f} (min: {min_liquidity:.2f})")
-            self.app.log(f"   • VWAP Distance: {vwap_dist:.2f}%")
-            self.app.log(f"   • Quality Time: {quality_time}")
+            add("🔬 MICROSTRUCTURE:")
+            add(f"   • Liquidity: {liquidity:.3f} (min: {min_liquidity:.2f})")
+            add(f"   • VWAP Distance: {vwap_dist:.2f}%")
+            add(f"   • Quality Time: {quality_time}")
             if atr_data:
-                self.app.log(f"   • ATR Ratio: {atr_data.get('ratio', 1):.2f} (max: 2.0)")
-                self.app.log(f"   • ATR Elevated: {atr_data.get('is_elevated', False)}")
+                add(f"   • ATR Ratio: {atr_data.get('ratio', 1):.2f} (max: 2.0)")
+                add(f"   • ATR Elevated: {atr_data.get('is_elevated', False)}")
         
-        self.app.log("🔍" * 60)
+        add(_SEP_SEARCH)
+        self.app.log("\n".join(lines))
     
-    def _detect_patterns(self, bars: List[Dict], regime_state: Dict = None) -> List[Dict]:
-        """Detect candlestick patterns"""
+    def _detect_patterns(self, bars: List[Dict], regime_state: Dict = None) -> Tuple[List[Dict], int, int]:
+        """
+        Detect candlestick patterns
+        
+        Returns:
+            (patterns, bullish_count, bearish_count) - counts kept while building the list
+        """
         patterns = []
+        bullish_count = 0
+        bearish_count = 0
+        atr = self.current_atr
+        pin_ratio = self.pin_bar_ratio
+        engulfing_min_size = self.engulfing_min_size
         
-        if len(bars) >= 3 and self.current_atr > 0:
+        if len(bars) >= 3 and atr > 0:
             last_bar = bars[-1]
-            prev_bar = bars[-2]
             prev_prev_bar = bars[-3]
             
             # Momentum detection
             move = last_bar['close'] - prev_prev_bar['close']
-            move_atr = abs(move) / self.current_atr if self.current_atr > 0 else 0
+            move_atr = abs(move) / atr
             
             if move_atr > self.momentum_threshold_atr:
-                direction = 'bullish' if move > 0 else 'bearish'
+                if move > 0:
+                    direction = 'bullish'
+                    bullish_count += 1
+                else:
+                    direction = 'bearish'
+                    bearish_count += 1
                 patterns.append({
                     'type': 'MOMENTUM',
                     'direction': direction,
@@ -1221,94 +1408,52 @@ class EdgeDetector:
                 })
         
         # Check classic patterns
-        for i in range(-3, 0):
-            if abs(i) > len(bars):
-                continue
+        # OHLC posledních barů rozbalíme jednou (itemgetter v C) - _bar_patterns pak pracuje s tuply
+        window = list(map(_OHLC, bars[-4:]))
+        n = len(window)
+        for idx in range(max(0, n - 3), n):
+            bar = window[idx]
+            prev_bar = window[idx - 1] if idx > 0 else None
+            i = idx - n  # bar_index relativně ke konci (-3..-1)
             
-            bar = bars[i]
-            prev_bar = bars[i-1] if i-1 >= -len(bars) else None
+            pin, eng, inside = _bar_patterns(prev_bar, bar, pin_ratio, engulfing_min_size)
             
             # Pin Bar
-            pin = self._is_pin_bar(bar)
             if pin:
+                if pin == 'bullish':
+                    bullish_count += 1
+                else:
+                    bearish_count += 1
                 patterns.append({
                     'type': PatternType.PIN_BAR,
                     'direction': pin,
                     'bar_index': i,
-                    'price': bar['high'] if pin == 'bearish' else bar['low']
+                    'price': bar[1] if pin == 'bearish' else bar[2]
                 })
             
             # Engulfing
-            if prev_bar:
-                eng = self._is_engulfing(prev_bar, bar)
-                if eng:
-                    patterns.append({
-                        'type': PatternType.ENGULFING,
-                        'direction': eng,
-                        'bar_index': i,
-                        'price': bar['close']
-                    })
+            if eng:
+                if eng == 'bullish':
+                    bullish_count += 1
+                else:
+                    bearish_count += 1
+                patterns.append({
+                    'type': PatternType.ENGULFING,
+                    'direction': eng,
+                    'bar_index': i,
+                    'price': bar[3]
+                })
             
             # Inside Bar
-            if prev_bar and self._is_inside_bar(prev_bar, bar):
+            if inside:
                 patterns.append({
                     'type': PatternType.INSIDE_BAR,
                     'direction': 'neutral',
                     'bar_index': i,
-                    'price': bar['close']
+                    'price': bar[3]
                 })
         
-        return patterns
-    
-    def _is_pin_bar(self, bar: Dict) -> Optional[str]:
-        """Detect pin bar pattern"""
-        body = abs(bar['close'] - bar['open'])
-        upper_wick = bar['high'] - max(bar['close'], bar['open'])
-        lower_wick = min(bar['close'], bar['open']) - bar['low']
-        total_range = bar['high'] - bar['low']
-        
-        if total_range == 0:
-            return None
-        
-        if lower_wick > body * self.pin_bar_ratio and lower_wick > upper_wick * 1.5:
-            if lower_wick / total_range > 0.5:
-                return 'bullish'
-        
-        if upper_wick > body * self.pin_bar_ratio and upper_wick > lower_wick * 1.5:
-            if upper_wick / total_range > 0.5:
-                return 'bearish'
-        
-        return None
-    
-    def _is_engulfing(self, prev_bar: Dict, bar: Dict) -> Optional[str]:
-        """Detect engulfing pattern"""
-        prev_body = abs(prev_bar['close'] - prev_bar['open'])
-        curr_body = abs(bar['close'] - bar['open'])
-        
-        if prev_body == 0:
-            return None
-        
-        if curr_body < prev_body * self.engulfing_min_size:
-            return None
-        
-        # Bullish engulfing
-        if (prev_bar['close'] < prev_bar['open'] and
-            bar['close'] > bar['open'] and
-            bar['close'] > prev_bar['open']):
-            return 'bullish'
-        
-        # Bearish engulfing
-        if (prev_bar['close'] > prev_bar['open'] and
-            bar['close'] < bar['open'] and
-            bar['close'] < prev_bar['open']):
-            return 'bearish'
-        
-        return None
-    
-    def _is_inside_bar(self, prev_bar: Dict, bar: Dict) -> bool:
-        """Detect inside bar pattern"""
-        return (bar['high'] <= prev_bar['high'] and 
-                bar['low'] >= prev_bar['low'])
+        return patterns, bullish_count, bearish_count
     
     def _get_ema34_trend(self, bars: List[Dict]) -> Optional[str]:
         """
@@ -1395,6 +1540,10 @@ class EdgeDetector:
         if len(bars) < period:
             return 0.0
         
+        # Batch mode (detect_signals_batch): bars is a prefix of the precomputed history
+        if self._ema_series is not None and period in self._ema_series:
+            return self._ema_series[period][len(bars) - 1]
+        
         # Ověřit, že máme validní close hodnoty
         closes = [bar.get('close', 0) for bar in bars[:period]]
         if not closes or all(c == 0 for c in closes):
@@ -1418,6 +1567,37 @@ class EdgeDetector:
                 
         return ema
     
+    @staticmethod
+    def _ema_series_for(bars: List[Dict], period: int) -> List[float]:
+        """
+        EMA pro každý prefix bars v jednom průchodu - series[i] == _calculate_ema(bars[:i + 1])
+        
+        Same seeding and update steps as _calculate_ema, so values are identical
+        """
+        series = [0.0] * len(bars)
+        if len(bars) < period:
+            return series
+        
+        closes = [bar.get('close', 0) for bar in bars[:period]]
+        sma_sum = sum(closes)
+        if all(c == 0 for c in closes) or sma_sum == 0:
+            return series
+        
+        multiplier = 2.0 / (period + 1.0)
+        ema = sma_sum / period
+        series[period - 1] = ema
+        for i in range(period, len(bars)):
+            close = bars[i].get('close', 0)
+            if close > 0:
+                ema = (close * multiplier) + (ema * (1.0 - multiplier))
+            series[i] = ema
+        return series
+    
+    @staticmethod
+    def _tr_series_for(bars: List[Dict]) -> List[float]:
+        """True range pro každý bar (series[0] = 0.0, nemá předchozí close)"""
+        return [0.0] + _true_ranges(bars) if bars else []
+    
     def _calculate_rsi(self, bars: List[Dict], period: int = 14) -> float:
         """
         Vypočítá Relative Strength Index (RSI)
@@ -1534,9 +1714,9 @@ class EdgeDetector:
             if lookback > 0:
                 recent_bars = bars[-lookback:-1]
                 if not last_high:
-                    last_high = max(b['high'] for b in recent_bars) if recent_bars else None
+                    last_high = max(map(_HIGH, recent_bars)) if recent_bars else None
                 if not last_low:
-                    last_low = min(b['low'] for b in recent_bars) if recent_bars else None
+                    last_low = min(map(_LOW, recent_bars)) if recent_bars else None
         
         # Zpracování swing high/low
         if isinstance(last_high, dict):
@@ -1621,9 +1801,9 @@ class EdgeDetector:
             if lookback > 0:
                 recent_bars = bars[-lookback:-1]  # Nezahrnujeme poslední bar
                 if not last_high:
-                    last_high = max(b['high'] for b in recent_bars) if recent_bars else None
+                    last_high = max(map(_HIGH, recent_bars)) if recent_bars else None
                 if not last_low:
-                    last_low = min(b['low'] for b in recent_bars) if recent_bars else None
+                    last_low = min(map(_LOW, recent_bars)) if recent_bars else None
         
         # Zpracování swing high/low - mohou být dict nebo float
         if isinstance(last_high, dict):
@@ -1644,7 +1824,7 @@ class EdgeDetector:
                 if current_high >= (last_high_price - tolerance):
                     # Kontrola 1b: Zkontrolujeme, zda poslední 2-3 bary ukazují růst (ne pullback)
                     if len(bars) >= 3:
-                        recent_highs = [b['high'] for b in bars[-3:]]
+                        recent_highs = list(map(_HIGH, bars[-3:]))
                         if all(h >= recent_highs[0] * 0.999 for h in recent_highs):  # Všechny bary jsou blízko high
                             if self.app:
                                 self.app.log(f"[SWING_EXTREME] Blocking: Current high {current_high:.1f} near/above last high {last_high_price:.1f} (uptrend)")
@@ -1657,7 +1837,7 @@ class EdgeDetector:
                 if current_low <= (last_low_price + tolerance):
                     # Kontrola 1b: Zkontrolujeme, zda poslední 2-3 bary ukazují pokles (ne pullback)
                     if len(bars) >= 3:
-                        recent_lows = [b['low'] for b in bars[-3:]]
+                        recent_lows = list(map(_LOW, bars[-3:]))
                         if all(l <= recent_lows[0] * 1.001 for l in recent_lows):  # Všechny bary jsou blízko low
                             if self.app:
                                 self.app.log(f"[SWING_EXTREME] Blocking: Current low {current_low:.1f} near/below last low {last_low_price:.1f} (downtrend)")
@@ -1750,9 +1930,9 @@ class EdgeDetector:
             if lookback > 0:
                 recent_bars = bars[-lookback:-1]
                 if not last_high:
-                    last_high = max(b['high'] for b in recent_bars) if recent_bars else None
+                    last_high = max(map(_HIGH, recent_bars)) if recent_bars else None
                 if not last_low:
-                    last_low = min(b['low'] for b in recent_bars) if recent_bars else None
+                    last_low = min(map(_LOW, recent_bars)) if recent_bars else None
         
         # Zpracování swing high/low
         if isinstance(last_high, dict):
@@ -1777,7 +1957,7 @@ class EdgeDetector:
                 # KONTROLA 2: Cena se musí vzdalovat od high (pullback pattern)
                 # Zkontrolujeme poslední 3 bary - měly by ukazovat pokles
                 if len(bars) >= 3:
-                    recent_closes = [b['close'] for b in bars[-3:]]
+                    recent_closes = list(map(_CLOSE, bars[-3:]))
                     # Pokud poslední 2 bary rostou → není to pullback
                     if recent_closes[-1] > recent_closes[-2]:
                         if self.app:
@@ -1785,7 +1965,7 @@ class EdgeDetector:
                         return False
                     
                     # Pokud cena je stále velmi blízko high → není to pullback
-                    max_recent_high = max(b['high'] for b in bars[-3:])
+                    max_recent_high = max(map(_HIGH, bars[-3:]))
                     if max_recent_high >= (last_high_price - pullback_tolerance * 2):
                         if self.app:
                             self.app.log(f"[PULLBACK] Rejecting: Recent high {max_recent_high:.1f} too close to swing high {last_high_price:.1f}")
@@ -1806,7 +1986,7 @@ class EdgeDetector:
                 
             # Pokud nemáme swing high, použijeme recent high z bars
             if len(bars) >= 5:
-                recent_high = max(b['high'] for b in bars[-5:-1])
+                recent_high = max(map(_HIGH, bars[-5:-1]))
                 if current_price < (recent_high - pullback_tolerance):
                     # Zkontrolujeme momentum
                     if len(bars) >= 2:
@@ -1826,7 +2006,7 @@ class EdgeDetector:
                 # KONTROLA 2: Cena se musí vzdalovat od low (pullback pattern)
                 # Zkontrolujeme poslední 3 bary - měly by ukazovat růst
                 if len(bars) >= 3:
-                    recent_closes = [b['close'] for b in bars[-3:]]
+                    recent_closes = list(map(_CLOSE, bars[-3:]))
                     # Pokud poslední 2 bary klesají → není to pullback
                     if recent_closes[-1] < recent_closes[-2]:
                         if self.app:
@@ -1834,7 +2014,7 @@ class EdgeDetector:
                         return False
                     
                     # Pokud cena je stále velmi blízko low → není to pullback
-                    min_recent_low = min(b['low'] for b in bars[-3:])
+                    min_recent_low = min(map(_LOW, bars[-3:]))
                     if min_recent_low <= (last_low_price + pullback_tolerance * 2):
                         if self.app:
                             self.app.log(f"[PULLBACK] Rejecting: Recent low {min_recent_low:.1f} too close to swing low {last_low_price:.1f}")
@@ -1855,7 +2035,7 @@ class EdgeDetector:
                 
             # Pokud nemáme swing low, použijeme recent low z bars
             if len(bars) >= 5:
-                recent_low = min(b['low'] for b in bars[-5:-1])
+                recent_low = min(map(_LOW, bars[-5:-1]))
                 if current_price > (recent_low + pullback_tolerance):
                     # Zkontrolujeme momentum
                     if len(bars) >= 2:
@@ -1877,16 +2057,22 @@ class EdgeDetector:
         - Méně false breakouts, lepší R:R
         """
         breaks = []
-        current_price = bars[-1]['close']
+        # Sloupec close pro posledních 20 barů - všechny kontroly níže čtou z něj místo bar dictů
+        closes = list(map(_CLOSE, bars[-20:]))
+        closes_offset = len(bars) - len(closes)  # index v bars = closes_offset + index v closes
+        current_price = closes[-1]
         
         lookback = self.swing_break_lookback
         last_high = swing_state.get('last_high')
         last_low = swing_state.get('last_low')
         
-        if last_high is None and len(bars) >= lookback:
-            last_high = max(b['high'] for b in bars[-lookback:])
-        if last_low is None and len(bars) >= lookback:
-            last_low = min(b['low'] for b in bars[-lookback:])
+        # Fallback na extrémy posledních `lookback` barů - jeden slice pro obě strany
+        if (last_high is None or last_low is None) and len(bars) >= lookback:
+            recent_bars = bars[-lookback:]
+            if last_high is None:
+                last_high = max(map(_HIGH, recent_bars))
+            if last_low is None:
+                last_low = min(map(_LOW, recent_bars))
         
         tolerance = self.current_atr * 0.3
         
@@ -1901,10 +2087,10 @@ class EdgeDetector:
             breakout_bar_idx = None
             
             # Hledej breakout v posledních 20 barech
-            for i in range(max(0, len(bars) - 20), len(bars) - 1):
-                if bars[i]['close'] > last_high:
+            for i in range(len(closes) - 1):
+                if closes[i] > last_high:
                     recent_breakout = True
-                    breakout_bar_idx = i
+                    breakout_bar_idx = closes_offset + i
                     break
             
             if recent_breakout and breakout_bar_idx is not None:
@@ -1918,8 +2104,7 @@ class EdgeDetector:
                     if current_price >= last_high * 0.999:  # Nad nebo velmi blízko levelu
                         # Zkontroluj momentum - poslední 2-3 bary by měly být bullish
                         if len(bars) >= 3:
-                            recent_closes = [b['close'] for b in bars[-3:]]
-                            if recent_closes[-1] >= recent_closes[-2]:  # Roste nebo drží
+                            if closes[-1] >= closes[-2]:  # Roste nebo drží
                                 breaks.append({
                                     'type': 'SWING_HIGH_BREAK_RETEST',
                                     'level': last_high,
@@ -1934,10 +2119,10 @@ class EdgeDetector:
             recent_breakout = False
             breakout_bar_idx = None
             
-            for i in range(max(0, len(bars) - 20), len(bars) - 1):
-                if bars[i]['close'] < last_low:
+            for i in range(len(closes) - 1):
+                if closes[i] < last_low:
                     recent_breakout = True
-                    breakout_bar_idx = i
+                    breakout_bar_idx = closes_offset + i
                     break
             
             if recent_breakout and breakout_bar_idx is not None:
@@ -1947,8 +2132,7 @@ class EdgeDetector:
                     # V downtrendu: cena by měla být pod nebo blízko levelu a začínat klesat
                     if current_price <= last_low * 1.001:  # Pod nebo velmi blízko levelu
                         if len(bars) >= 3:
-                            recent_closes = [b['close'] for b in bars[-3:]]
-                            if recent_closes[-1] <= recent_closes[-2]:  # Klesá nebo drží
+                            if closes[-1] <= closes[-2]:  # Klesá nebo drží
                                 breaks.append({
                                     'type': 'SWING_LOW_BREAK_RETEST',
                                     'level': last_low,
@@ -1968,21 +2152,21 @@ class EdgeDetector:
             # Swing high breakout
             if last_high and current_price > last_high:
                 # VALIDACE 1: Close confirmation - bar musí uzavřít nad levelem
-                if bars[-1]['close'] <= last_high:
+                if current_price <= last_high:
                     # Breakout nepotvrzen close → pravděpodobně false breakout
                         if self.app and self.logging.should_log('breakout', f"false_breakout_close:{last_high:.1f}"):
-                            self.app.log(f"[FALSE_BREAKOUT] Blocking: Price broke {last_high:.1f} but closed at {bars[-1]['close']:.1f} (below level)")
+                            self.app.log(f"[FALSE_BREAKOUT] Blocking: Price broke {last_high:.1f} but closed at {current_price:.1f} (below level)")
                     # NEPŘIDÁVAT - false breakout
                 else:
                     # VALIDACE 2: Multiple bar confirmation - min 2 bary nad levelem
                     bars_above = 0
                     for i in range(-1, -min(3, len(bars)), -1):
-                        if bars[i]['close'] > last_high:
+                        if closes[i] > last_high:
                             bars_above += 1
                     
                     if bars_above >= 2:
                         # VALIDACE 3: Momentum check - cena by měla růst
-                        if len(bars) >= 2 and bars[-1]['close'] >= bars[-2]['close']:
+                        if len(closes) >= 2 and current_price >= closes[-2]:
                             breaks.append({
                                 'type': 'SWING_HIGH_BREAK',
                                 'level': last_high,
@@ -2000,19 +2184,19 @@ class EdgeDetector:
             # Swing low breakout
             if last_low and current_price < last_low:
                 # VALIDACE 1: Close confirmation
-                if bars[-1]['close'] >= last_low:
+                if current_price >= last_low:
                     if self.app and self.logging.should_log('breakout', f"false_breakout_close:{last_low:.1f}"):
-                        self.app.log(f"[FALSE_BREAKOUT] Blocking: Price broke {last_low:.1f} but closed at {bars[-1]['close']:.1f} (above level)")
+                        self.app.log(f"[FALSE_BREAKOUT] Blocking: Price broke {last_low:.1f} but closed at {current_price:.1f} (above level)")
                 else:
                     # VALIDACE 2: Multiple bar confirmation
                     bars_below = 0
                     for i in range(-1, -min(3, len(bars)), -1):
-                        if bars[i]['close'] < last_low:
+                        if closes[i] < last_low:
                             bars_below += 1
                     
                     if bars_below >= 2:
                         # VALIDACE 3: Momentum check
-                        if len(bars) >= 2 and bars[-1]['close'] <= bars[-2]['close']:
+                        if len(closes) >= 2 and current_price <= closes[-2]:
                             breaks.append({
                                 'type': 'SWING_LOW_BREAK',
                                 'level': last_low,
@@ -2027,15 +2211,16 @@ class EdgeDetector:
                         if self.app and self.logging.should_log('breakout', f"false_breakout_bars:{last_low:.1f}"):
                             self.app.log(f"[FALSE_BREAKOUT] Blocking: Breakout below {last_low:.1f} but only {bars_below} bars confirmed (need 2+)")
         
-        # Pivot tests
-        for level_name, level_value in (pivot_levels or {}).items():
-            if isinstance(level_value, (int, float)) and abs(current_price - level_value) <= tolerance:
-                breaks.append({
-                    'type': f'PIVOT_{level_name}_TEST',
-                    'level': level_value,
-                    'direction': 'neutral',
-                    'confidence': 60
-                })
+        # Pivot tests - bez ATR (cold start) je tolerance 0, test by chytil jen přesnou shodu ceny
+        if tolerance > 0 and pivot_levels:
+            for level_name, level_value in pivot_levels.items():
+                if isinstance(level_value, (int, float)) and abs(current_price - level_value) <= tolerance:
+                    breaks.append({
+                        'type': f'PIVOT_{level_name}_TEST',
+                        'level': level_value,
+                        'direction': 'neutral',
+                        'confidence': 60
+                    })
         
         return breaks
     
@@ -2047,52 +2232,30 @@ class EdgeDetector:
         # Detekce, jestli pracujeme s M5 bary pro indexy (DAX/NASDAQ)
         # Tyto trhy se obvykle pohybují 20-100 bodů za M5 bar
         
-        tr_values = []
-        for i in range(1, len(bars)):
-            high = bars[i]['high']
-            low = bars[i]['low']
-            prev_close = bars[i-1]['close']
-            
-            tr = max(
-                high - low,
-                abs(high - prev_close),
-                abs(low - prev_close)
-            )
-            tr_values.append(tr)
-        
-        if len(tr_values) >= period:
-            raw_atr = sum(tr_values[-period:]) / float(period)
+        # ATR = průměr posledních `period` TR - stačí projít jen posledních period+1 barů
+        # (dříve se TR počítal pro celou historii a zahodil)
+        if self._tr_series is not None:
+            # Batch mode (detect_signals_batch): TR předpočítané pro celou historii
+            n = len(bars)
+            true_ranges = self._tr_series[n - period:n]
         else:
-            raw_atr = sum(tr_values) / float(len(tr_values)) if tr_values else 0.0
-        
-        # Detekce cenového rozsahu pro určení správného ATR
-        if len(bars) > 0:
-            current_price = bars[-1]['close']
-            
-            # Pro indexy (DAX ~26000, NASDAQ ~26000)
-            if current_price > 20000:
-                # ATR je v bodech, ale data přišla jako celkový pohyb
-                # Typické M5 ATR pro indexy je 20-50 bodů
-                
-                # Pokud raw_atr vypadá jako celý rozsah (> 1000), 
-                # pravděpodobně máme špatná data
-                if raw_atr > 500:
-                    # Pro M5 timeframe použít realistické hodnoty
-                    if current_price > 25000:  # DAX
-                        return 30.0  # Typické ATR pro DAX M5
-                    else:
-                        return 40.0  # Typické ATR pro NASDAQ M5
-                
-                # Jinak ATR vypadá rozumně
-                return raw_atr
-            
-            # Pro jiné instrumenty
-            else:
-                # Zde by měla být jiná logika podle typu instrumentu
-                return min(raw_atr, 100.0)  # Cap na rozumnou hodnotu
+            true_ranges = _true_ranges(bars[-period - 1:])
+        tr_sum = 0.0
+        for tr in true_ranges:
+            tr_sum += tr
+        raw_atr = tr_sum / float(period)
         
-        # Fallback
-        return min(raw_atr, 50.0)
+        # Detekce cenového rozsahu pro určení správného ATR (len(bars) > period zaručeno výše)
+        current_price = bars[-1]['close']
+        if current_price <= _ATR_INDEX_MIN_PRICE:
+            # Pro jiné instrumenty - cap na rozumnou hodnotu
+            return min(raw_atr, _ATR_OTHER_CAP)
+        
+        # Pro indexy (DAX ~26000, NASDAQ ~26000) - typické M5 ATR je 20-50 bodů.
+        # raw_atr nad limitem vypadá jako celkový pohyb (špatná data) → typická hodnota
+        if raw_atr > _ATR_INDEX_RAW_CAP:
+            return _ATR_DAX_TYPICAL if current_price > _ATR_DAX_MIN_PRICE else _ATR_NASDAQ_TYPICAL
+        return raw_atr
     
     def is_quality_trading_time(self, symbol: str, micro_data: Dict) -> bool:
         """
@@ -2101,28 +2264,30 @@ class EdgeDetector:
         Returns:
             True if time is good for trading, False otherwise
         """
-        # Check liquidity score - read from config
-        min_liquidity = self.main_config.get('microstructure', {}).get('min_liquidity_score', 0.1)
-        if micro_data.get('liquidity_score', 0) < min_liquidity:
+        # Check liquidity score - config resolved in __init__
+        if micro_data.get('liquidity_score', 0) < self._quality_time_min_liquidity:
             return False
         
         # Check if it's high quality time
         if not micro_data.get('is_high_quality_time', False):
             return False
         
-        # Symbol-specific time windows
-        from datetime import datetime
-        now = datetime.now()
-        hour = now.hour
-        
-        if 'DAX' in symbol.upper() or 'DE40' in symbol.upper():
-            # DAX quality hours: 9:00-15:30 CET
-            return (9 <= hour < 15) or (hour == 15 and now.minute <= 30)
-        elif 'NASDAQ' in symbol.upper() or 'US100' in symbol.upper():
-            # NASDAQ quality hours: 15:30-22:00 CET
-            return (hour == 15 and now.minute >= 30) or (16 <= hour < 22)
+        # Symbol-specific time windows (klasifikace symbolu jen při prvním volání)
+        window = self._quality_windows.get(symbol, False)
+        if window is False:
+            upper = symbol.upper()
+            if 'DAX' in upper or 'DE40' in upper:
+                window = _QUALITY_WINDOW_DAX
+            elif 'NASDAQ' in upper or 'US100' in upper:
+                window = _QUALITY_WINDOW_NASDAQ
+            else:
+                window = None
+            self._quality_windows[symbol] = window
         
-        return True
+        if window is None:
+            return True
+        now = datetime.now()
+        return now.hour * 60 + now.minute in window
     
     def calculate_microstructure_score(self, micro_data: Dict) -> float:
         """
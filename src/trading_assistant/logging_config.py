@@ -39,6 +39,8 @@ class LoggingConfig:
         self.log_validations = self.log_level == LogLevel.DEBUG
         self.log_breakout_details = self.log_level in [LogLevel.NORMAL, LogLevel.VERBOSE, LogLevel.DEBUG]
         self.log_position_details = True  # Always log position details
+        # Full per-signal diagnostics block in EdgeDetector (runtime-toggleable attribute)
+        self.log_signal_diagnostics = self.config.get('signal_diagnostics', True)
         
     def should_log(self, category: str, message: str = None) -> bool:
         """